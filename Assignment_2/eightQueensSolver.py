@@ -1,106 +1,337 @@
 import random
 import math
+import time
+import multiprocessing
+from array import array
+
+# numpy is optional, only best_neighbor_vectorized needs it
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 # Repersent a set of 8 queens that must resided on an 8x8 space.
-from typing import Tuple
+from typing import List, Tuple, Iterator
+
+
+# Greedy start for size queens, one per column and per row, starting from a random order of rows. Column by column, a
+# few random rows from the ones still unused are tried and the first whose diagonals are both free is taken. Only the
+# columns where every try failed start out attacked, which for large boards leaves a handful of conflicts.
+# return the row of every column, the queen counts on the diagonals keyed by col - row + size - 1 and col + row, and
+# the threat level, all in int arrays
+def greedy_rows(size: int, tries: int = 128) -> Tuple[array, array, array, int]:
+    diags = array('i', [0]) * (2 * size - 1)
+    anti_diags = array('i', [0]) * (2 * size - 1)
+    rows = array('i', range(size))
+    random.shuffle(rows)
+    randrange = random.randrange
+
+    for col in range(size):
+        for _ in range(tries):
+            pick = randrange(col, size)
+            row = rows[pick]
+            if diags[col - row + size - 1] == 0 and anti_diags[col + row] == 0:
+                rows[col], rows[pick] = row, rows[col]
+                break
+        row = rows[col]
+        diags[col - row + size - 1] += 1
+        anti_diags[col + row] += 1
+
+    threat = sum(count * (count - 1) for count in diags if count > 1)
+    threat += sum(count * (count - 1) for count in anti_diags if count > 1)
+    return rows, diags, anti_diags, threat
 
 
 class BoardState:
     BOARD_SIZE = 8
 
-    def __init__(self, occupied_spaces=[]):
+    def __init__(self, occupied_spaces: List[Tuple[int, int]] = None, size: int = BOARD_SIZE):
+        if occupied_spaces is None:
+            occupied_spaces = []
 
         self._occupied_spaces = occupied_spaces
+        self._size = size
+
+        # number of queens on every line a queen can attack along, diagonals are keyed by x - y and x + y.
+        # A line holding c queens adds c * (c - 1) to the threat level, once for each ordered pair.
+        # Kept in int arrays, 4 bytes a line, so very large boards stay small.
+        self._firsts = array('i', [0]) * size
+        self._seconds = array('i', [0]) * size
+        self._diags = array('i', [0]) * (2 * size - 1)
+        self._anti_diags = array('i', [0]) * (2 * size - 1)
+        self._threat = 0
+        for space in occupied_spaces:
+            self._place(space, 1)
+
+    # add (direction 1) or remove (direction -1) one queen from a line, keeping the threat level in step
+    def _count(self, lines: List[int], key: int, direction: int) -> None:
+        if direction > 0:
+            self._threat += 2 * lines[key]
+            lines[key] += 1
+        else:
+            lines[key] -= 1
+            self._threat -= 2 * lines[key]
+
+    # add or remove the queen at space on both of its diagonals
+    def _place_diagonals(self, space: Tuple[int, int], direction: int) -> None:
+        self._count(self._diags, space[0] - space[1] + self._size - 1, direction)
+        self._count(self._anti_diags, space[0] + space[1], direction)
 
+    # add or remove the queen at space on every line it sits on
+    def _place(self, space: Tuple[int, int], direction: int) -> None:
+        self._count(self._firsts, space[0], direction)
+        self._count(self._seconds, space[1], direction)
+        self._place_diagonals(space, direction)
+
+    # check whether queen i shares any line with another queen
+    def is_attacked(self, i: int) -> bool:
+        x, y = self._occupied_spaces[i]
+        return (self._firsts[x] > 1 or self._seconds[y] > 1 or self._diags[x - y + self._size - 1] > 1
+                or self._anti_diags[x + y] > 1)
+
+    # indexes of every queen that shares a line with another queen
+    def attacked_queens(self) -> List[int]:
+        return [i for i in range(len(self._occupied_spaces)) if self.is_attacked(i)]
 
     # Simplify this problem by acknowleging that every column will have a queen
     def init_fill(self):
 
-        for i in range(0, self.BOARD_SIZE):
+        for i in range(0, self._size):
             self._occupied_spaces.append((i, i))
+            self._place((i, i), 1)
 
-    # compute the best neighbor by swaping the row of every queen against every other and taking the best outcome
-    def best_neighbor(self):
+    # Fill the board with one queen per column and per row from greedy_rows. Any queens already on the board are
+    # replaced. The line counts are taken from greedy_rows rather than counted queen by queen.
+    def greedy_fill(self, tries: int = 128):
+        size = self._size
+        rows, self._diags, self._anti_diags, self._threat = greedy_rows(size, tries)
+        self._occupied_spaces[:] = list(zip(range(size), rows))
+        self._firsts = array('i', [1]) * size
+        self._seconds = array('i', [1]) * size
+
+    # change in threat level from swapping the rows of queens i and j, found by applying the swap to the
+    # line counts and taking it back again, O(1)
+    def swap_delta(self, i: int, j: int) -> int:
+        before = self._threat
+        self.swap(i, j)
+        after = self._threat
+        self.swap(i, j)
+        return after - before
 
-        neighbors = {}
+    # swap the rows of queens i and j in place, updating the line counts in O(1). The queens only trade rows,
+    # so the row and column counts stay the same and just the diagonals change.
+    def swap(self, i: int, j: int) -> None:
+        first = self._occupied_spaces[i]
+        second = self._occupied_spaces[j]
+        self._place_diagonals(first, -1)
+        self._place_diagonals(second, -1)
+        first, second = (first[0], second[1]), (second[0], first[1])
+        self._place_diagonals(first, 1)
+        self._place_diagonals(second, 1)
+        self._occupied_spaces[i] = first
+        self._occupied_spaces[j] = second
 
-        def swap_row(dict, space_1, space_2):
-            sp1_row = space_1[1]
-            dict[space_1[0]] = space_2[1]
-            dict[space_2[0]] = sp1_row
+    # compute the best neighbor by swaping the row of every queen against every other and taking the best outcome.
+    # Each swap is scored from the line counts in O(1) instead of building a board for it. Swapping two queens that
+    # are not attacked can not lower the threat level, so the first queen is only taken from the attacked ones.
+    def best_neighbor(self):
 
         #--------------------------------------------------------
         # This section allows for different out comes
-        base_list = list(range(0, self.BOARD_SIZE))
-        board_rows = base_list.copy()
+        base_list = list(range(0, len(self._occupied_spaces)))
+        board_rows = [i for i in base_list if self.is_attacked(i)] or base_list.copy()
         random.shuffle(board_rows)
         board_cols = base_list.copy()
         random.shuffle(board_cols)
         #--------------------------------------------------------
 
+        best = None
         for i in board_rows:
             for j in board_cols:
                 if i != j:
-                    oc_dict = {x: y for x, y in self._occupied_spaces}
-                    start = self._occupied_spaces[i]
-                    stop = self._occupied_spaces[j]
-                    swap_row(oc_dict, start, stop)
-                    board = BoardState(list(oc_dict.items()))
-                    neighbors[board.get_threat_level()] = board
+                    delta = self.swap_delta(i, j)
+                    if best is None or delta <= best[0]:
+                        best = (delta, i, j)
+
+        board = self.copy()
+        board.swap(best[1], best[2])
+        return board
+
+    # change in threat level for swapping the row of each queen in `queens` with every queen, as a
+    # len(queens) by N numpy array. The board is taken as arrays of columns and rows and the four diagonal updates a
+    # swap makes are applied to the counts one after another, with broadcast equality masks correcting the count
+    # whenever two of the touched diagonals are the same line. Swapping a queen with itself is set to the maximum.
+    def swap_deltas(self, queens: List[int]):
+        if np is None:
+            raise Exception("swap_deltas needs numpy.")
+
+        spaces = np.array(self._occupied_spaces, dtype=np.int64).reshape(-1, 2)
+        xs, ys = spaces[:, 0], spaces[:, 1]
+        queens = np.asarray(queens, dtype=np.int64)
+        x_i, y_i = xs[queens][:, None], ys[queens][:, None]
+        x_j, y_j = xs[None, :], ys[None, :]
 
-        lowest_threat = min(neighbors.keys())
-        return neighbors[lowest_threat]
+        delta = np.zeros((len(queens), len(xs)), dtype=np.int64)
+        for counts, sign, offset in [(self._diags, -1, self._size - 1), (self._anti_diags, 1, 0)]:
+            counts = np.frombuffer(counts, dtype=np.int32).astype(np.int64)
+            old_i = x_i + sign * y_i + offset
+            old_j = x_j + sign * y_j + offset
+            new_i = x_i + sign * y_j + offset
+            new_j = x_j + sign * y_i + offset
+
+            delta -= 2 * (counts[old_i] - 1)
+            delta -= 2 * (counts[old_j] - (old_j == old_i) - 1)
+            delta += 2 * (counts[new_i] - (new_i == old_i) - (new_i == old_j))
+            delta += 2 * (counts[new_j] - (new_j == old_i) - (new_j == old_j) + (new_j == new_i))
+
+        delta[np.arange(len(queens)), queens] = np.iinfo(np.int64).max
+        return delta
+
+    # best_neighbor with every swap scored at once by swap_deltas, a random one of the best swaps is taken.
+    # Falls back to best_neighbor when numpy is not installed.
+    def best_neighbor_vectorized(self):
+        if np is None:
+            return self.best_neighbor()
+
+        base_list = list(range(0, len(self._occupied_spaces)))
+        board_rows = [i for i in base_list if self.is_attacked(i)] or base_list
+
+        delta = self.swap_deltas(board_rows)
+        best = np.flatnonzero(delta == delta.min())
+        i, j = divmod(int(random.choice(best)), len(base_list))
+
+        board = self.copy()
+        board.swap(board_rows[i], j)
+        return board
 
     #deep copy the board state
     def copy(self):
-        new_board = BoardState()
-        new_board._occupied_spaces = [x for x in self._occupied_spaces]
-        return new_board
+        return BoardState([x for x in self._occupied_spaces], self._size)
 
-    # Compute number of threats that a queen faces. Higher number implies worse board
+    # Compute number of threats that a queen faces. Higher number implies worse board.
+    # Every ordered pair of queens sharing a row, column or diagonal counts once per shared line,
+    # kept up to date by the line counts so this is O(1)
     def get_threat_level(self) -> int:
+        return self._threat
 
-        #check that two queens are on same row
-        def same_row(new: Tuple[int,int], existing: Tuple[int,int]) -> bool:
-            return new[0] == existing[0]
-
-        # check that two queens are on same column
-        def same_col(new: Tuple[int,int], existing: Tuple[int,int])-> bool:
-            return new[1] == existing[1]
-
-        # Check that the difference in the x,y is the same, implying square shift, implying same diagnal.
-        def same_diag(new: Tuple[int,int], existing: Tuple[int,int]) -> bool:
-            return abs(new[0] - existing[0]) == abs(new[1] - existing[1])
-
-        threat = 0
-        for space in self._occupied_spaces:
-            for other_space in self._occupied_spaces:
-                spaces = [space, other_space]
-                if space != other_space: #ignore current queen to allow for result of zero
-                    if same_diag(*spaces):
-                        threat += 1
-                    if same_col(*spaces):
-                        threat += 1
-                    if same_row(*spaces):
-                        threat += 1
-        return threat
+    # number of queens on the board
+    def __len__(self) -> int:
+        return len(self._occupied_spaces)
 
     #pretty print board.
     def __str__(self):
+        occupied = set(self._occupied_spaces)
         rows = []
-        for row in range(0, self.BOARD_SIZE):
-            row_str = "".join(
-                ["[Q]" if (row, col) in self._occupied_spaces else "[ ]" for col in range(0, self.BOARD_SIZE)])
+        for row in range(0, self._size):
+            row_str = "".join(["[Q]" if (row, col) in occupied else "[ ]" for col in range(0, self._size)])
             rows.append(row_str)
         rows.append(f"Threat Level: {self.get_threat_level()}")
 
         return '\n'.join(rows)
 
 
+# One queen per column with the rows as a permutation, column i holds its queen in row rows[i]. No two queens can
+# share a row or column, so only the diagonals are counted. Takes the same methods as BoardState that anneal and
+# min_conflicts use, stored in int arrays with no tuple per queen.
+class PermutationBoard:
+    __slots__ = ('_rows', '_size', '_diags', '_anti_diags', '_threat')
+
+    # rows defaults to the main diagonal, like BoardState.init_fill
+    def __init__(self, rows: List[int] = None, size: int = BoardState.BOARD_SIZE):
+        if rows is None:
+            rows = range(size)
+        self._rows = array('i', rows)
+        self._size = len(self._rows)
+        if sorted(self._rows) != list(range(self._size)):
+            raise Exception("Rows must be a permutation of 0 to size - 1.")
+        self._count_lines()
+
+    # rebuild the diagonal counts and threat level from the rows
+    def _count_lines(self) -> None:
+        size = self._size
+        self._diags = array('i', [0]) * (2 * size - 1)
+        self._anti_diags = array('i', [0]) * (2 * size - 1)
+        for col, row in enumerate(self._rows):
+            self._diags[col - row + size - 1] += 1
+            self._anti_diags[col + row] += 1
+        self._threat = sum(count * (count - 1) for count in self._diags if count > 1)
+        self._threat += sum(count * (count - 1) for count in self._anti_diags if count > 1)
 
+    # add (direction 1) or remove (direction -1) the queen at col, row from both of its diagonals
+    def _place(self, col: int, row: int, direction: int) -> None:
+        for lines, key in ((self._diags, col - row + self._size - 1), (self._anti_diags, col + row)):
+            if direction > 0:
+                self._threat += 2 * lines[key]
+                lines[key] += 1
+            else:
+                lines[key] -= 1
+                self._threat -= 2 * lines[key]
+
+    # check whether the queen in column i shares a diagonal with another queen
+    def is_attacked(self, i: int) -> bool:
+        row = self._rows[i]
+        return self._diags[i - row + self._size - 1] > 1 or self._anti_diags[i + row] > 1
+
+    # columns of every queen that shares a diagonal with another queen
+    def attacked_queens(self) -> List[int]:
+        return [i for i in range(self._size) if self.is_attacked(i)]
+
+    # the same greedy start as BoardState.greedy_fill, replacing whatever rows the board had
+    def greedy_fill(self, tries: int = 128):
+        self._rows, self._diags, self._anti_diags, self._threat = greedy_rows(self._size, tries)
+
+    # change in threat level from swapping the rows of columns i and j, O(1)
+    def swap_delta(self, i: int, j: int) -> int:
+        before = self._threat
+        self.swap(i, j)
+        after = self._threat
+        self.swap(i, j)
+        return after - before
+
+    # swap the rows of columns i and j in place, updating the diagonal counts in O(1)
+    def swap(self, i: int, j: int) -> None:
+        row_i, row_j = self._rows[i], self._rows[j]
+        self._place(i, row_i, -1)
+        self._place(j, row_j, -1)
+        self._place(i, row_j, 1)
+        self._place(j, row_i, 1)
+        self._rows[i], self._rows[j] = row_j, row_i
+
+    # copy the board, the arrays are copied rather than recounted
+    def copy(self):
+        board = PermutationBoard.__new__(PermutationBoard)
+        board._rows = array('i', self._rows)
+        board._size = self._size
+        board._diags = array('i', self._diags)
+        board._anti_diags = array('i', self._anti_diags)
+        board._threat = self._threat
+        return board
 
-# use simualted annealing to get the best solution
-def simulated_annealing(start):
+    # number of ordered pairs of queens sharing a diagonal, O(1)
+    def get_threat_level(self) -> int:
+        return self._threat
+
+    # the same board as a BoardState
+    def board_state(self) -> BoardState:
+        return BoardState(list(enumerate(self._rows)), self._size)
+
+    # number of queens on the board
+    def __len__(self) -> int:
+        return self._size
+
+    # pretty print the board in the same layout as BoardState, one line per column built straight from its row
+    def __str__(self):
+        size = self._size
+        rows = ["[ ]" * row + "[Q]" + "[ ]" * (size - row - 1) for row in self._rows]
+        rows.append(f"Threat Level: {self.get_threat_level()}")
+
+        return '\n'.join(rows)
+
+
+
+
+# use simualted annealing to get the best solution. quiet skips printing every accepted board
+def simulated_annealing(start, quiet: bool = False):
     state = start
     for trial in reversed(range(10000000)):
         prev_state = state
@@ -112,11 +343,434 @@ def simulated_annealing(start):
 
         dif_weight = new_h - old_h
         sol_better = new_h <= old_h
-        accept_worse = random.uniform(0, 1) > math.exp(-dif_weight / trial)
+        accept_worse = random.uniform(0, 1) < math.exp(-dif_weight / trial)
         if sol_better or accept_worse:
             state = rand_neighb
-            print(rand_neighb)
-            print()
+            if not quiet:
+                print(rand_neighb)
+                print()
+
+
+# Cooling schedules for anneal. Each one gives the current temperature and is told after every step whether the
+# proposed swap was accepted. reset starts it over for a restart.
+
+# temperature falls by a constant factor every step, never below minimum
+class ExponentialSchedule:
+
+    def __init__(self, start: float = 4.0, alpha: float = 0.9995, minimum: float = 0.05):
+        self.start = start
+        self.alpha = alpha
+        self.minimum = minimum
+        self.reset()
+
+    def reset(self) -> None:
+        self._temperature = self.start
+
+    def temperature(self) -> float:
+        return self._temperature
+
+    def update(self, accepted: bool) -> None:
+        self._temperature = max(self.minimum, self._temperature * self.alpha)
+
+
+# temperature start / log(step + 2), the slow schedule annealing's convergence proofs are based on
+class LogarithmicSchedule:
+
+    def __init__(self, start: float = 2.0):
+        self.start = start
+        self.reset()
+
+    def reset(self) -> None:
+        self._step = 0
+
+    def temperature(self) -> float:
+        return self.start / math.log(self._step + 2)
+
+    def update(self, accepted: bool) -> None:
+        self._step += 1
+
+
+# temperature steered so the share of accepted swaps over each window of steps tracks a target rate that itself
+# decays toward zero, heating up when too few swaps get through and cooling when too many do
+class AdaptiveSchedule:
+
+    def __init__(self, start: float = 2.0, target: float = 0.3, target_decay: float = 0.99, window: int = 100,
+                 factor: float = 1.1, minimum: float = 0.05):
+        self.start = start
+        self.initial_target = target
+        self.target_decay = target_decay
+        self.window = window
+        self.factor = factor
+        self.minimum = minimum
+        self.reset()
+
+    def reset(self) -> None:
+        self._temperature = self.start
+        self._target = self.initial_target
+        self._steps = 0
+        self._accepted = 0
+
+    def temperature(self) -> float:
+        return self._temperature
+
+    def update(self, accepted: bool) -> None:
+        self._steps += 1
+        self._accepted += accepted
+        if self._steps == self.window:
+            if self._accepted / self._steps < self._target:
+                self._temperature *= self.factor
+            else:
+                self._temperature = max(self.minimum, self._temperature / self.factor)
+            self._target *= self.target_decay
+            self._steps = 0
+            self._accepted = 0
+
+
+# Convergence statistics gathered by anneal
+class AnnealingStats:
+
+    def __init__(self):
+        self.steps = 0
+        self.accepted = 0
+        self.uphill_accepted = 0
+        self.restarts = 0
+        self.seconds = 0.0
+        self.best_threat = None
+        # (step, threat level) every time a run reached a new lowest threat level
+        self.history = []
+
+    @property
+    def steps_per_second(self) -> float:
+        return self.steps / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return (f"threat level {self.best_threat} after {self.steps} steps and {self.restarts} restarts in "
+                f"{self.seconds:0.4f} seconds ({self.steps_per_second:0.0f} steps/s), accepted {self.accepted} "
+                f"swaps of which {self.uphill_accepted} uphill")
+
+
+# Simulated annealing over row swaps. Each step proposes one swap, its first queen an attacked one where a few
+# random picks find one, scores it in O(1) from the line counts and accepts it if it does not raise the threat
+# level or with probability exp(-delta / temperature) otherwise. A run ends at zero threats or after max_steps, and
+# up to `restarts` further runs start from fresh random boards of the same type as start, a BoardState or a
+# PermutationBoard. schedule defaults to ExponentialSchedule.
+# If stop (an event such as multiprocessing.Event) is given, it is polled every 1024 steps and annealing ends once
+# it is set. Unless quiet the summary is printed. Each run keeps the swaps accepted since its lowest threat level and
+# undoes them at the end, so it ends on its best board rather than wherever it wandered to.
+# return the board with the lowest threat level and the statistics
+def anneal(start, schedule=None, max_steps: int = 1000000, restarts: int = 0,
+           quiet: bool = True, stop=None) -> Tuple[BoardState, AnnealingStats]:
+    if schedule is None:
+        schedule = ExponentialSchedule()
+    stats = AnnealingStats()
+    size = len(start)
+    best = None
+    tic = time.perf_counter()
+
+    for run in range(restarts + 1):
+        if run == 0:
+            board = start.copy()
+        else:
+            stats.restarts += 1
+            board = type(start)(size=size)
+            board.greedy_fill(tries=0)
+        schedule.reset()
+        run_best = board.get_threat_level()
+        stats.history.append((stats.steps, run_best))
+        since_best = []
+
+        for _ in range(max_steps):
+            if board.get_threat_level() == 0:
+                break
+            if stop is not None and stats.steps % 1024 == 0 and stop.is_set():
+                break
+            i = random.randrange(size)
+            for _ in range(4):
+                if board.is_attacked(i):
+                    break
+                i = random.randrange(size)
+            j = random.randrange(size - 1)
+            if j >= i:
+                j += 1
+
+            delta = board.swap_delta(i, j)
+            accepted = delta <= 0 or random.random() < math.exp(-delta / schedule.temperature())
+            if accepted:
+                board.swap(i, j)
+                since_best.append((i, j))
+                stats.accepted += 1
+                if delta > 0:
+                    stats.uphill_accepted += 1
+            schedule.update(accepted)
+            stats.steps += 1
+
+            if board.get_threat_level() < run_best:
+                run_best = board.get_threat_level()
+                stats.history.append((stats.steps, run_best))
+                since_best = []
+
+        # a swap is its own inverse
+        for i, j in reversed(since_best):
+            board.swap(i, j)
+        if best is None or board.get_threat_level() < best.get_threat_level():
+            best = board
+        if best.get_threat_level() == 0 or (stop is not None and stop.is_set()):
+            break
+
+    stats.seconds = time.perf_counter() - tic
+    stats.best_threat = best.get_threat_level()
+    if not quiet:
+        print(f"Annealing on {size} queens: {stats}")
+    return best, stats
+
+
+# Repair board, a BoardState or a PermutationBoard, in place with min conflicts local search. Every attacked queen
+# in turn is offered `sample` random partners and swaps rows with the one that lowers the threat level the most.
+# When a whole pass over the attacked queens finds no improving swap, one of them swaps with a random partner to get
+# off the plateau.
+# Stops at zero threats, after max_steps swaps or once the optional stop event is set. Unless quiet every swap prints
+# the board, and if summary the step count and time are printed at the end. return the board and the number of swaps
+def min_conflicts(board, max_steps: int = 10000000, sample: int = 64,
+                  quiet: bool = True, stop=None, summary: bool = True) -> Tuple[BoardState, int]:
+    tic = time.perf_counter()
+    size = len(board)
+    steps = 0
+
+    while board.get_threat_level() > 0 and steps < max_steps and not (stop is not None and stop.is_set()):
+        attacked = board.attacked_queens()
+        random.shuffle(attacked)
+        improved = False
+        for i in attacked:
+            if steps >= max_steps or board.get_threat_level() == 0 or (stop is not None and stop.is_set()):
+                break
+            if not board.is_attacked(i):
+                continue
+
+            best_delta, best_j = 0, None
+            for _ in range(sample):
+                j = random.randrange(size)
+                if j != i:
+                    delta = board.swap_delta(i, j)
+                    if delta < best_delta:
+                        best_delta, best_j = delta, j
+
+            if best_j is not None:
+                board.swap(i, best_j)
+                steps += 1
+                improved = True
+                if not quiet:
+                    print(board)
+                    print()
+
+        if not improved and board.get_threat_level() > 0 and steps < max_steps:
+            i = random.choice(attacked)
+            j = random.randrange(size)
+            if i != j:
+                board.swap(i, j)
+                steps += 1
+
+    toc = time.perf_counter()
+    if summary:
+        print(f"Min conflicts on {size} queens: threat level {board.get_threat_level()} after {steps} steps "
+              f"in {toc - tic:0.4f} seconds")
+    return board, steps
+
+
+# Portfolio runs. K workers race on the same board size from different seeds and the first to reach zero threats
+# sets a shared event that makes the others give up, so one unlucky start no longer decides the run time.
+
+# the stop event shared with portfolio workers, handed over by the pool initializer since events can not be pickled
+portfolio_stop = None
+
+
+# pool initializer, keep the shared stop event in the worker process
+def set_portfolio_stop(stop) -> None:
+    global portfolio_stop
+    portfolio_stop = stop
+
+
+# one portfolio worker, job is (worker id, engine, size, seed, max_steps). Engine "anneal" starts from a random
+# board, "min_conflicts" from greedy_fill. return a description of how the worker finished
+def portfolio_worker(job: Tuple[int, str, int, int, int]) -> dict:
+    worker, engine, size, seed, max_steps = job
+    random.seed(seed)
+    tic = time.perf_counter()
+
+    board = BoardState([], size)
+    if engine == "anneal":
+        board.greedy_fill(tries=0)
+        board, stats = anneal(board, max_steps=max_steps, stop=portfolio_stop)
+        steps = stats.steps
+    elif engine == "min_conflicts":
+        board.greedy_fill()
+        board, steps = min_conflicts(board, max_steps=max_steps, stop=portfolio_stop, summary=False)
+    else:
+        raise Exception(f"Unknown engine. {engine}")
+
+    return {
+        "worker": worker,
+        "seed": seed,
+        "solved": board.get_threat_level() == 0,
+        "threat": board.get_threat_level(),
+        "steps": steps,
+        "seconds": time.perf_counter() - tic,
+    }
+
+
+# Race `workers` seeded copies of engine on a size by size board, one process each. The first to solve it stops the
+# rest. return the wall time until the first solution (None if nobody solved it), the winner and every worker's result
+def run_portfolio(size: int, workers: int = 4, engine: str = "anneal", seed: int = 0,
+                  max_steps: int = 1000000) -> dict:
+    stop = multiprocessing.Event()
+    jobs = [(worker, engine, size, seed * workers + worker, max_steps) for worker in range(workers)]
+    results = []
+    winner = None
+    time_to_solution = None
+
+    tic = time.perf_counter()
+    with multiprocessing.Pool(workers, initializer=set_portfolio_stop, initargs=(stop,)) as pool:
+        for result in pool.imap_unordered(portfolio_worker, jobs):
+            results.append(result)
+            if result["solved"] and winner is None:
+                time_to_solution = time.perf_counter() - tic
+                winner = result
+                stop.set()
+
+    return {"time_to_solution": time_to_solution, "winner": winner,
+            "workers": sorted(results, key=lambda result: result["worker"])}
+
+
+# Run `trials` portfolios from different seeds and summarize how long each took to its first solution
+def time_to_solution_distribution(size: int, workers: int = 4, trials: int = 10, engine: str = "anneal",
+                                  max_steps: int = 1000000) -> dict:
+    runs = [run_portfolio(size, workers, engine, seed, max_steps) for seed in range(trials)]
+    times = sorted(run["time_to_solution"] for run in runs if run["time_to_solution"] is not None)
+
+    def percentile(fraction: float) -> float:
+        return times[max(0, math.ceil(fraction * len(times)) - 1)] if times else None
+
+    return {
+        "size": size,
+        "workers": workers,
+        "engine": engine,
+        "trials": trials,
+        "solved": len(times),
+        "min": times[0] if times else None,
+        "p50": percentile(0.5),
+        "p90": percentile(0.9),
+        "max": times[-1] if times else None,
+        "mean": sum(times) / len(times) if times else None,
+    }
+
+
+# Exact enumeration. A solution is a tuple giving the column of the queen in every row. The search places one row
+# at a time with the columns and both diagonals already under attack kept as bitmasks, so the free squares of a row
+# are a single and-not and each one is peeled off with free & -free.
+
+# number of solutions with the first row's queen in column `first`, job is (size, first)
+def count_from_first_row(job: Tuple[int, int]) -> int:
+    size, first = job
+    full = (1 << size) - 1
+
+    def place(cols: int, diags: int, anti_diags: int) -> int:
+        if cols == full:
+            return 1
+        count = 0
+        free = full & ~(cols | diags | anti_diags)
+        while free:
+            bit = free & -free
+            free ^= bit
+            count += place(cols | bit, ((diags | bit) << 1) & full, (anti_diags | bit) >> 1)
+        return count
+
+    bit = 1 << first
+    return place(bit, (bit << 1) & full, bit >> 1)
+
+
+# Count every solution on a size by size board. Mirroring a board left to right moves the first queen from column c
+# to size - 1 - c, so only the left half of the first row is searched and doubled, plus the middle column once on
+# odd boards. The first row columns are shared out over a pool of processes.
+def count_solutions(size: int = BoardState.BOARD_SIZE, processes: int = None) -> int:
+    jobs = [(size, first) for first in range((size + 1) // 2)]
+    with multiprocessing.Pool(processes) as pool:
+        counts = pool.map(count_from_first_row, jobs)
+
+    total = 2 * sum(counts[:size // 2])
+    if size % 2 == 1:
+        total += counts[-1]
+    return total
+
+
+# Yield the solutions one at a time, those with the first queen in one of first_columns (every column by default).
+# An explicit stack of free square masks replaces recursion, so nothing but the current partial board is kept.
+def solutions(size: int = BoardState.BOARD_SIZE, first_columns: List[int] = None) -> Iterator[Tuple[int, ...]]:
+    full = (1 << size) - 1
+    first_mask = full if first_columns is None else sum(1 << col for col in first_columns)
+
+    placed = []
+    stack = [(first_mask, 0, 0, 0)]
+    while stack:
+        free, cols, diags, anti_diags = stack.pop()
+        if not free:
+            if placed:
+                placed.pop()
+            continue
+        bit = free & -free
+        stack.append((free ^ bit, cols, diags, anti_diags))
+        placed.append(bit.bit_length() - 1)
+
+        cols |= bit
+        if cols == full:
+            yield tuple(placed)
+            placed.pop()
+            continue
+        diags = ((diags | bit) << 1) & full
+        anti_diags = (anti_diags | bit) >> 1
+        stack.append((full & ~(cols | diags | anti_diags), cols, diags, anti_diags))
+
+
+# every solution with the first queen in column first, packed as bytes to keep the trip between processes small
+def solutions_from_first_row(job: Tuple[int, int]) -> List[bytes]:
+    size, first = job
+    return [bytes(solution) for solution in solutions(size, [first])]
+
+
+# Yield every solution with the first row columns shared out over a pool of processes. Solutions arrive one first
+# row column at a time, as each worker finishes, so only that column's solutions are held at once.
+def parallel_solutions(size: int = BoardState.BOARD_SIZE, processes: int = None) -> Iterator[Tuple[int, ...]]:
+    with multiprocessing.Pool(processes) as pool:
+        for chunk in pool.imap_unordered(solutions_from_first_row, [(size, first) for first in range(size)]):
+            for packed in chunk:
+                yield tuple(packed)
+
+
+# the 8 rotations and reflections of a solution
+def symmetries(solution: Tuple[int, ...]) -> List[Tuple[int, ...]]:
+    size = len(solution)
+    images = []
+    board = solution
+    for _ in range(4):
+        images.append(board)
+        images.append(tuple(size - 1 - col for col in board))
+        # rotate a quarter turn, the queen at (row, col) moves to (col, size - 1 - row)
+        rotated = [0] * size
+        for row, col in enumerate(board):
+            rotated[col] = size - 1 - row
+        board = tuple(rotated)
+    return images
+
+
+# Yield one solution from every group of solutions that are rotations or reflections of each other, the smallest of
+# its 8 images. The smallest image always has its first queen in the left half, so only that half is searched.
+def unique_solutions(size: int = BoardState.BOARD_SIZE) -> Iterator[Tuple[int, ...]]:
+    for solution in solutions(size, list(range((size + 1) // 2))):
+        if solution == min(symmetries(solution)):
+            yield solution
+
+
+# a BoardState holding the queens of a solution
+def solution_board(solution: Tuple[int, ...]) -> BoardState:
+    return BoardState(list(enumerate(solution)), len(solution))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,199 @@
+from typing import List, Tuple, Dict
+from collections import deque
+import mmap, os, struct, time
+
+from slidingPuzzleSolver import PuzzleState, SearchStats, make_goal_puzzle, a_star_search, ida_star_search, \
+    goal_file_key, goal_to_bytes, goal_from_bytes
+
+# Disjoint additive pattern databases for the sliding puzzle.
+# A pattern database holds, for one group of tiles, the fewest moves of those tiles needed to bring them from any
+# placement to their goal positions while every other tile is treated as interchangeable. Only moves of the group's
+# own tiles are counted, so the values of groups that share no tiles can be added and the sum is still admissible.
+# A table is indexed by sum(position of tiles[i] * cells ** i) and stored one byte per entry.
+
+UNSEEN = 255
+MAGIC = b'SPDB'
+HEADER = struct.Struct('<4sBBB')
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pattern_databases')
+
+# the groups used when none are given, grouped into compact blocks of the goal board
+DEFAULT_GROUPS = {
+    3: [[1, 2, 3, 4], [5, 6, 7, 8]],
+    4: [[1, 2, 3, 5, 6], [4, 7, 8, 11, 12], [9, 10, 13, 14, 15]],
+}
+
+
+# backward breadth first search from the goal over placements of `tiles` and the blank, return the table
+# of the fewest moves of those tiles needed from every placement. Moving the blank through any other tile is free,
+# so this is a 0-1 BFS, with free moves going to the front of the queue.
+def build_table(goal: PuzzleState, tiles: List[int]) -> bytearray:
+    cells = goal.size * goal.size
+    goal_list = goal.tile_list()
+    moves = [goal.neighbor_indexes(index) for index in range(cells)]
+    weights = [cells ** i for i in range(len(tiles))]
+
+    table = bytearray([UNSEEN]) * (cells ** len(tiles))
+    distances = bytearray([UNSEEN]) * (cells ** len(tiles) * cells)
+
+    start_index = sum(goal_list.index(tile) * weight for tile, weight in zip(tiles, weights))
+    start = start_index * cells + goal_list.index(PuzzleState.BLANK)
+    distances[start] = 0
+    front = deque([start])
+
+    while front:
+        state = front.popleft()
+        index, blank = divmod(state, cells)
+        distance = distances[state]
+        if distance < table[index]:
+            table[index] = distance
+
+        occupied = {}
+        rest = index
+        for i in range(len(tiles)):
+            rest, position = divmod(rest, cells)
+            occupied[position] = i
+
+        for position in moves[blank]:
+            i = occupied.get(position)
+            if i is None:
+                neighbor = index * cells + position
+                if distance < distances[neighbor]:
+                    distances[neighbor] = distance
+                    front.appendleft(neighbor)
+            else:
+                neighbor = (index + (blank - position) * weights[i]) * cells + position
+                if distance + 1 < distances[neighbor]:
+                    distances[neighbor] = distance + 1
+                    front.append(neighbor)
+
+    return table
+
+
+# The table for a single group of tiles, either freshly built in memory or memory mapped from disk
+class PatternDatabase:
+
+    def __init__(self, goal: PuzzleState, tiles: List[int], table):
+        self.goal = goal
+        self.tiles = tiles
+        self.table = table
+        self._mapped = None
+
+    # build the table for `tiles` from scratch
+    @classmethod
+    def build(cls, goal: PuzzleState, tiles: List[int]) -> 'PatternDatabase':
+        return cls(goal, tiles, build_table(goal, tiles))
+
+    # write the header, goal board, tiles and the table bytes to path
+    def save(self, path: str) -> None:
+        with open(path, 'wb') as out_file:
+            out_file.write(HEADER.pack(MAGIC, self.goal.size, self.goal.wrap, len(self.tiles)))
+            out_file.write(goal_to_bytes(self.goal))
+            out_file.write(bytes(self.tiles))
+            out_file.write(self.table)
+
+    # memory map a table written by save, the pages are shared by every process that loads the same file
+    @classmethod
+    def load(cls, path: str) -> 'PatternDatabase':
+        with open(path, 'rb') as in_file:
+            mapped = mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, size, wrap, tile_count = HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC:
+            raise Exception(f"Not a pattern database. {path}")
+
+        offset = HEADER.size
+        goal = goal_from_bytes(mapped, offset, size, wrap)
+        offset += size * size
+        tiles = list(mapped[offset:offset + tile_count])
+        offset += tile_count
+
+        database = cls(goal, tiles, memoryview(mapped)[offset:])
+        database._mapped = mapped
+        return database
+
+    # index of this group's placement given a map of tile -> flat position
+    def index_of(self, positions: Dict[int, int]) -> int:
+        cells = self.goal.size * self.goal.size
+        return sum(positions[tile] * cells ** i for i, tile in enumerate(self.tiles))
+
+    # the fewest moves of this group's tiles needed to put them in place
+    def get_weight(self, state: PuzzleState) -> int:
+        positions = {tile: index for index, tile in enumerate(state.tile_list())}
+        return self.table[self.index_of(positions)]
+
+
+# A set of pattern databases over disjoint groups of tiles whose values add up to one heuristic
+class AdditivePatternDatabase:
+
+    def __init__(self, databases: List[PatternDatabase]):
+        seen = set()
+        for database in databases:
+            if seen & set(database.tiles):
+                raise Exception("Pattern database groups must not share tiles.")
+            seen |= set(database.tiles)
+        self.databases = databases
+
+    # build one database per group, groups default to DEFAULT_GROUPS for the goal's size
+    @classmethod
+    def build(cls, goal: PuzzleState, groups: List[List[int]] = None) -> 'AdditivePatternDatabase':
+        if groups is None:
+            groups = DEFAULT_GROUPS[goal.size]
+        return cls([PatternDatabase.build(goal, tiles) for tiles in groups])
+
+    # the file a group's table is stored in inside directory
+    @staticmethod
+    def file_name(goal: PuzzleState, tiles: List[int], directory: str) -> str:
+        return os.path.join(directory, f"{goal_file_key(goal)}_{'-'.join(str(tile) for tile in tiles)}.pdb")
+
+    # write every table to directory
+    def save(self, directory: str = DEFAULT_DIRECTORY) -> None:
+        os.makedirs(directory, exist_ok=True)
+        for database in self.databases:
+            database.save(self.file_name(database.goal, database.tiles, directory))
+
+    # memory map the tables for goal and groups from directory, building and saving any that are missing
+    @classmethod
+    def load_or_build(cls, goal: PuzzleState, groups: List[List[int]] = None,
+                      directory: str = DEFAULT_DIRECTORY) -> 'AdditivePatternDatabase':
+        if groups is None:
+            groups = DEFAULT_GROUPS[goal.size]
+
+        databases = []
+        for tiles in groups:
+            path = cls.file_name(goal, tiles, directory)
+            if not os.path.exists(path):
+                os.makedirs(directory, exist_ok=True)
+                PatternDatabase.build(goal, tiles).save(path)
+            databases.append(PatternDatabase.load(path))
+        return cls(databases)
+
+    # heuristic in the same form as PuzzleState.get_heuristic_weight, lower weight means closer to goal.
+    # goal must be the board the databases were built for.
+    def get_heuristic_weight(self, state: PuzzleState, goal: PuzzleState) -> int:
+        positions = {tile: index for index, tile in enumerate(state.tile_list())}
+        return sum(database.table[database.index_of(positions)] for database in self.databases)
+
+    # allow the database to be passed straight to a_star_search as its heuristic
+    def __call__(self, state: PuzzleState, goal: PuzzleState) -> int:
+        return self.get_heuristic_weight(state, goal)
+
+    # the (tiles, table) pairs ida_star_search takes as pattern_tables
+    def tables(self) -> List[Tuple[List[int], List[int]]]:
+        return [(database.tiles, database.table) for database in self.databases]
+
+
+if __name__ == '__main__':
+    for size in DEFAULT_GROUPS.keys():
+        goal = make_goal_puzzle(size, wrap=size == PuzzleState.DEFAULT_BOARD_SIZE)
+        tic = time.perf_counter()
+        pdb = AdditivePatternDatabase.load_or_build(goal)
+        toc = time.perf_counter()
+        print(f"{size}x{size} pattern databases ready in {toc - tic:0.4f} seconds")
+
+    goal = make_goal_puzzle(3)
+    pdb = AdditivePatternDatabase.load_or_build(goal)
+    start = PuzzleState([[1, 8, 2], [-1, 4, 3], [7, 6, 5]])
+    stats = SearchStats()
+    print(len(a_star_search(start, goal, pdb, stats)) - 1, stats)
+    stats = SearchStats()
+    print(len(ida_star_search(start, goal, stats, pdb.tables())) - 1, stats)
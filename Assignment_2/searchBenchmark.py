@@ -0,0 +1,124 @@
+from typing import List, Tuple, Dict, Callable
+import json, math, random, subprocess, sys, time, tracemalloc
+
+from slidingPuzzleSolver import PuzzleState, SearchStats, ALGORITHMS, problems, make_goal_puzzle, \
+    make_random_puzzle_at_depth
+
+# Benchmark suite for the sliding puzzle searches.
+# Every algorithm is run over fixed, seeded instance sets. Timing runs are kept apart from the tracemalloc run
+# because tracing slows allocation down. Results are written as json so runs from different commits can be diffed.
+
+# instance set name -> (seed, number of boards, optimal depth). "problems" is the assignment's own list.
+INSTANCE_SETS = {
+    "problems": None,
+    "depth-6": (6, 20, 6),
+    "depth-9": (9, 10, 9),
+    "depth-12": (12, 5, 12),
+}
+
+DEFAULT_ALGORITHMS = ["BFS", "IDDFS", "A*"]
+
+
+# build the (start, goal) pairs of an instance set, the same boards every time for a given name
+def make_instance_set(name: str) -> List[Tuple[PuzzleState, PuzzleState]]:
+    if INSTANCE_SETS[name] is None:
+        return [(problem["start"], problem["goal"]) for problem in problems]
+
+    seed, count, depth = INSTANCE_SETS[name]
+    saved_state = random.getstate()
+    random.seed(seed)
+    try:
+        return [(make_random_puzzle_at_depth(depth), make_goal_puzzle()) for _ in range(count)]
+    finally:
+        random.setstate(saved_state)
+
+
+# nearest rank percentile of values, fraction between 0 and 1
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+# minimum, percentiles and maximum of a list of measurements
+def summarize(values: List[float]) -> Dict[str, float]:
+    return {
+        "min": min(values),
+        "p50": percentile(values, 0.5),
+        "p90": percentile(values, 0.9),
+        "p99": percentile(values, 0.99),
+        "max": max(values),
+        "mean": sum(values) / len(values),
+    }
+
+
+# run algorithm on every instance: `repeat` (at least 1) timed runs each, keeping the fastest, then one run under tracemalloc
+# for the peak memory. return the per instance records and their summary.
+def benchmark_algorithm(algorithm: Callable, instances: List[Tuple[PuzzleState, PuzzleState]],
+                        repeat: int = 3) -> Dict:
+    if repeat < 1:
+        raise Exception("repeat must be at least 1.")
+    records = []
+    for start, goal in instances:
+        seconds = []
+        for _ in range(repeat):
+            stats = SearchStats()
+            tic = time.perf_counter()
+            path = algorithm(start, goal, stats)
+            toc = time.perf_counter()
+            seconds.append(toc - tic)
+
+        tracemalloc.start()
+        algorithm(start, goal, SearchStats())
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        records.append({
+            "start": start.tile_list(),
+            "moves": len(path) - 1 if path else None,
+            "seconds": min(seconds),
+            "expanded": stats.expanded,
+            "generated": stats.generated,
+            "peak_frontier": stats.peak_frontier,
+            "peak_memory_bytes": peak_memory,
+        })
+
+    summary = {key: summarize([record[key] for record in records])
+               for key in ["seconds", "expanded", "generated", "peak_frontier", "peak_memory_bytes"]}
+    return {"summary": summary, "instances": records}
+
+
+# the commit the benchmark ran against, None when not inside a git checkout
+def current_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# benchmark every algorithm on every instance set and write the results as json to out_path
+def run_suite(algorithms: List[str] = None, instance_sets: List[str] = None, repeat: int = 3,
+              out_path: str = "benchmark.json") -> Dict:
+    if algorithms is None:
+        algorithms = DEFAULT_ALGORITHMS
+    if instance_sets is None:
+        instance_sets = list(INSTANCE_SETS.keys())
+
+    results = {"commit": current_commit(), "python": sys.version.split()[0], "repeat": repeat, "sets": {}}
+    for set_name in instance_sets:
+        instances = make_instance_set(set_name)
+        results["sets"][set_name] = {}
+        for label in algorithms:
+            result = benchmark_algorithm(ALGORITHMS[label], instances, repeat)
+            results["sets"][set_name][label] = result
+            seconds = result["summary"]["seconds"]
+            print(f"{set_name} {label} -> p50 {seconds['p50']:0.4f}s p90 {seconds['p90']:0.4f}s "
+                  f"max {seconds['max']:0.4f}s")
+
+    with open(out_path, 'w') as out_file:
+        json.dump(results, out_file, indent=2)
+    return results
+
+
+if __name__ == '__main__':
+    run_suite()
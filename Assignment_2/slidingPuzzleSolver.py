@@ -1,92 +1,151 @@
-from typing import List, Tuple, Callable
-import itertools, time, sys, random
+from typing import List, Tuple, Callable, Dict
+import itertools, time, sys, random, heapq, bisect, math, mmap, os, struct, json, multiprocessing
+from collections import deque
 
-WANT_APROX_DEPTH = True
-if WANT_APROX_DEPTH:
-    depths = []
-
-# Puzzle state represents a 3 by 3 board of spaces.
-# 8 spaces are occupied by a tile. One space is blank.
+# Puzzle state represents a size by size board of spaces, 3 by 3 unless told otherwise.
+# size * size - 1 spaces are occupied by a tile. One space is blank.
 # Each tile has a label.
+# By default moves wrap around the edges of the board, so the blank always has 4 neighbors. Pass wrap=False
+# for the classic puzzle where tiles stop at the edge.
+# The board is packed into a single integer code, a fixed number of bits per space in row major order with the
+# blank stored as 0, so hashing and equality are constant time integer operations. The blank position is cached.
 class PuzzleState:
     BLANK = -1
-    BOARD_SIZE = 3
-    VALID_TILE_VALUE_RANGE = list(range(1, 9)) + [-1]
-
-    # The state is represented by a list of lists. Must be 3 lists containing 3 integers between 1 and 8 and -1
-    def __init__(self, rows: List[List[int]]):
-        self._rows = rows
-
-        existing_vals = []
+    DEFAULT_BOARD_SIZE = 3
+    WRAP_EDGES = True
+
+    __slots__ = ('_code', '_blank', '_size', '_wrap', '_bits')
+
+    # The state is described by a list of lists. Must be size lists each containing size integers,
+    # the integers between 1 and size * size - 1 and -1 for the blank
+    def __init__(self, rows: List[List[int]], wrap: bool = WRAP_EDGES):
+        size = len(rows)
+        bits = max(1, (size * size - 1).bit_length())
+        code = 0
+        blank = None
+        existing_vals = set()
+        index = 0
         for row in rows:
-            if len(row) != self.BOARD_SIZE:
+            if len(row) != size:
                 raise Exception("Bad game state.")
             for val in row:
-                if type(val) != int or val not in self.VALID_TILE_VALUE_RANGE:
+                if type(val) != int or not (val == self.BLANK or 1 <= val < size * size):
                     raise Exception(f"Bad tile value. {val}")
                 elif val in existing_vals:
                     raise Exception("Val already in state.")
+                existing_vals.add(val)
+                if val == self.BLANK:
+                    blank = index
                 else:
-                    existing_vals.append(val)
-
-    # Print the current board in a nice 3x3 grid with a border
+                    code |= val << (index * bits)
+                index += 1
+
+        if blank is None:
+            raise Exception("Bad game state.")
+
+        self._code = code
+        self._blank = blank
+        self._size = size
+        self._wrap = wrap
+        self._bits = bits
+
+    # build a state straight from a packed code, blank index and board shape, skipping validation
+    @classmethod
+    def from_code(cls, code: int, blank: int, size: int = DEFAULT_BOARD_SIZE, wrap: bool = WRAP_EDGES) -> 'PuzzleState':
+        state = cls.__new__(cls)
+        state._code = code
+        state._blank = blank
+        state._size = size
+        state._wrap = wrap
+        state._bits = max(1, (size * size - 1).bit_length())
+        return state
+
+    # Print the current board in a nice grid with a border
     def __str__(self):
+        width = len(str(self._size * self._size - 1))
 
         def val_or_b(row: int, col: int) -> str:
-            return self._rows[row][col] if self._rows[row][col] != self.BLANK else "B"
-
-        out = [
-            "+--------------+",
-            f"| {val_or_b(0, 0)}    {val_or_b(0, 1)}    {val_or_b(0, 2)}  |",
-            f"| {val_or_b(1, 0)}    {val_or_b(1, 1)}    {val_or_b(1, 2)}  |",
-            f"| {val_or_b(2, 0)}    {val_or_b(2, 1)}    {val_or_b(2, 2)}  |",
-            "+--------------+"
-        ]
+            val = self.get_tile(row, col)
+            return str(val if val != self.BLANK else "B").ljust(width)
 
-        return '\n'.join(out)
+        lines = [f"| {'    '.join(val_or_b(i, j) for j in range(self._size))}  |" for i in range(self._size)]
+        border = "+" + "-" * (len(lines[0]) - 2) + "+"
 
-    # serialize the board to allow usage of 'in' keyword when interacting with lists
+        return '\n'.join([border] + lines + [border])
+
+    # the packed code uniquely identifies the board, so it doubles as the hash
     def __hash__(self):
-        return hash(str(self))
+        return hash(self._code)
+
+    # pickle as the packed code rather than the slot values, keeps states small when sent between processes
+    def __reduce__(self):
+        return PuzzleState.from_code, (self._code, self._blank, self._size, self._wrap)
 
     @property
-    # get the raw list of lists that describe the state of the board
-    def rows(self):
-        return self._rows
+    # the packed integer code of the board
+    def code(self) -> int:
+        return self._code
 
-    # two boards are equal provided that for every row and every column, the value of the row, col combo match
-    def __eq__(self, other: 'PuzzleState') -> bool:
+    @property
+    # number of rows (and columns) on the board
+    def size(self) -> int:
+        return self._size
 
-        def tiles_are_equal(i: int, j: int) -> bool:
-            return self.get_tile(i, j) == other.get_tile(i, j)
+    @property
+    # whether moves wrap around the edges of the board
+    def wrap(self) -> bool:
+        return self._wrap
 
-        b_range = range(self.BOARD_SIZE)
+    @property
+    # get a fresh list of lists that describe the state of the board
+    def rows(self) -> List[List[int]]:
+        return [[self.get_tile(i, j) for j in range(self._size)] for i in range(self._size)]
+
+    # get the tiles of the board as one flat list in row major order
+    def tile_list(self) -> List[int]:
+        return [self.get_tile(i, j) for i, j in itertools.product(range(self._size), range(self._size))]
 
-        equalities = [tiles_are_equal(i, j) for i, j in itertools.product(b_range, b_range)]
-        return all(equalities)
+    # two boards are equal provided that they have the same shape and their packed codes match
+    def __eq__(self, other: 'PuzzleState') -> bool:
+        return self._code == other._code and self._size == other._size
 
-    # get the coordinates of a board after compensation for overflow. row `BOARD_SIZE + 1` should be row `0`
+    # get the coordinates of a board after compensation for overflow. row `size + 1` should be row `0`
     def in_board_coords(self, row: int, col: int) -> Tuple[int, int]:
 
-        mrow = row % self.BOARD_SIZE
-        mcol = col % self.BOARD_SIZE
+        mrow = row % self._size
+        mcol = col % self._size
         return mrow, mcol
 
     # get value of tile at row,col intersection
     def get_tile(self, row: int, col: int) -> int:
         mrow, mcol = self.in_board_coords(row, col)
-        return self._rows[mrow][mcol]
+        index = mrow * self._size + mcol
+        if index == self._blank:
+            return self.BLANK
+        return (self._code >> (index * self._bits)) & ((1 << self._bits) - 1)
 
     # set value of tile at row,col intersection
     def set_tile(self, row: int, col: int, val: int):
         mrow, mcol = self.in_board_coords(row, col)
-        self._rows[mrow][mcol] = val
+        index = mrow * self._size + mcol
+        shift = index * self._bits
+        self._code &= ~(((1 << self._bits) - 1) << shift)
+        if val == self.BLANK:
+            self._blank = index
+        else:
+            self._code |= val << shift
+            if index == self._blank:
+                self._blank = None
 
     # check if tile_pos is neighbor of current blank node, true implying that swap is legal
     def can_swap_with_blank(self, tile_pos: Tuple[int, int]) -> bool:
-        tile_pos = self.in_board_coords(tile_pos[0], tile_pos[1])
         blank_x, blank_y = self.get_blank_node()
 
+        if not self._wrap:
+            in_board = 0 <= tile_pos[0] < self._size and 0 <= tile_pos[1] < self._size
+            return in_board and abs(tile_pos[0] - blank_x) + abs(tile_pos[1] - blank_y) == 1
+
+        tile_pos = self.in_board_coords(tile_pos[0], tile_pos[1])
         allowed_moves = [
             self.in_board_coords(blank_x + 1, blank_y) == tile_pos,
             self.in_board_coords(blank_x, blank_y + 1) == tile_pos,
@@ -96,6 +155,21 @@ class PuzzleState:
 
         return any(allowed_moves)
 
+    # get the flat indexes of the spaces the blank could swap with if it sat at flat index `index`
+    def neighbor_indexes(self, index: int) -> List[int]:
+        row, col = divmod(index, self._size)
+        out = []
+        for d_row, d_col in [(1, 0), (0, 1), (-1, 0), (0, -1)]:
+            n_row, n_col = row + d_row, col + d_col
+            if self._wrap:
+                n_row, n_col = self.in_board_coords(n_row, n_col)
+            elif not (0 <= n_row < self._size and 0 <= n_col < self._size):
+                continue
+            n_index = n_row * self._size + n_col
+            if n_index != index and n_index not in out:
+                out.append(n_index)
+        return out
+
     # swap tile_pos with current blank position
     def swap_with_blank(self, tile_pos: Tuple[int, int]) -> None:
         blank = self.get_blank_node()
@@ -105,27 +179,137 @@ class PuzzleState:
 
     # get the position of the blank node
     def get_blank_node(self) -> Tuple[int, int]:
-        for i in range(self.BOARD_SIZE):
-            for j in range(self.BOARD_SIZE):
-                val = self._rows[i][j]
-                if val == self.BLANK:
-                    return i, j
+        return divmod(self._blank, self._size)
 
     # create deep copy of the puzzel state
     def copy(self) -> 'PuzzleState':
-        new_state = [[x for x in row] for row in self._rows]
-        return PuzzleState(new_state)
+        return PuzzleState.from_code(self._code, self._blank, self._size, self._wrap)
+
+    # whether goal can be reached from this board. Every move swaps the blank with one tile, flipping the parity of the
+    # permutation between the boards, and moves the blank one step, flipping the parity of its row + col distance to
+    # the goal's blank, so both parities must agree. On odd width boards that wrap, crossing the edge moves the blank
+    # an even distance, which breaks the tie and makes every board solvable. Runs in O(cells) by counting cycles.
+    def is_solvable(self, goal: 'PuzzleState') -> bool:
+        if self._wrap and self._size % 2 == 1:
+            return True
+
+        goal_index = {tile: index for index, tile in enumerate(goal.tile_list())}
+        permutation = [goal_index[tile] for tile in self.tile_list()]
+        cycles = 0
+        seen = [False] * len(permutation)
+        for index in range(len(permutation)):
+            if not seen[index]:
+                cycles += 1
+                while not seen[index]:
+                    seen[index] = True
+                    index = permutation[index]
+
+        blank_row, blank_col = self.get_blank_node()
+        goal_row, goal_col = goal.get_blank_node()
+        blank_distance = abs(blank_row - goal_row) + abs(blank_col - goal_col)
+        return (len(permutation) - cycles) % 2 == blank_distance % 2
 
     # Lower weight means better option
     def get_heuristic_weight(self, goal: 'PuzzleState') -> int:
         out_of_place_tiles = 0
-        board_range = range(self.BOARD_SIZE)
+        board_range = range(self._size)
         for i, j in itertools.product(board_range, board_range):
             if self.get_tile(i, j) != self.BLANK and self.get_tile(i, j) != goal.get_tile(i, j):
                 out_of_place_tiles += 1
 
         return out_of_place_tiles
 
+    # get the (row, col) position of every tile on the board, keyed by tile value
+    def tile_positions(self) -> Dict[int, Tuple[int, int]]:
+        board_range = range(self._size)
+        return {self.get_tile(i, j): (i, j) for i, j in itertools.product(board_range, board_range)}
+
+    # number of moves between two rows or two columns, crossing the edge of the board when that is shorter
+    def axis_distance(self, a: int, b: int) -> int:
+        dist = abs(a - b)
+        if self._wrap:
+            return min(dist, self._size - dist)
+        return dist
+
+    # Sum over the tiles of the moves each needs to reach its goal position if nothing were in the way
+    def get_manhattan_distance(self, goal: 'PuzzleState') -> int:
+        goal_positions = goal.tile_positions()
+        distance = 0
+        board_range = range(self._size)
+        for i, j in itertools.product(board_range, board_range):
+            tile = self.get_tile(i, j)
+            if tile != self.BLANK:
+                goal_row, goal_col = goal_positions[tile]
+                distance += self.axis_distance(i, goal_row) + self.axis_distance(j, goal_col)
+        return distance
+
+    # Manhattan distance plus two moves for every tile that has to step out of its goal row or column
+    # to let the other tiles in that line get past it
+    def get_linear_conflict_weight(self, goal: 'PuzzleState') -> int:
+        goal_positions = goal.tile_positions()
+        conflicts = 0
+        board_range = range(self._size)
+        for line in board_range:
+            row_goals = []
+            col_goals = []
+            for k in board_range:
+                tile = self.get_tile(line, k)
+                if tile != self.BLANK and goal_positions[tile][0] == line:
+                    row_goals.append(goal_positions[tile][1])
+                tile = self.get_tile(k, line)
+                if tile != self.BLANK and goal_positions[tile][1] == line:
+                    col_goals.append(goal_positions[tile][0])
+            conflicts += line_conflicts(row_goals, self._size, self._wrap)
+            conflicts += line_conflicts(col_goals, self._size, self._wrap)
+
+        return self.get_manhattan_distance(goal) + 2 * conflicts
+
+
+# length of the longest strictly increasing subsequence of values
+def longest_increasing_run(values: List[int]) -> int:
+    tails = []
+    for value in values:
+        pos = bisect.bisect_left(tails, value)
+        if pos == len(tails):
+            tails.append(value)
+        else:
+            tails[pos] = value
+    return len(tails)
+
+
+# Given the goal positions of the tiles sitting in their goal line, listed in their current order along the line,
+# return the fewest tiles that must leave the line so the rest can slide into place without passing each other.
+# When moves wrap around the edge the tiles only keep their cyclic order, so every rotation is tried.
+def line_conflicts(goal_positions: List[int], size: int, wrap: bool) -> int:
+    if not wrap:
+        return len(goal_positions) - longest_increasing_run(goal_positions)
+    if len(goal_positions) < 3:
+        return 0
+
+    keep = 0
+    for start in range(len(goal_positions)):
+        rotated = goal_positions[start:] + goal_positions[:start]
+        offset = rotated[0]
+        keep = max(keep, longest_increasing_run([(pos - offset) % size for pos in rotated]))
+    return len(goal_positions) - keep
+
+
+# Counters describing how much work a search did
+class SearchStats:
+
+    def __init__(self):
+        self.expanded = 0
+        self.generated = 0
+        self.peak_frontier = 0
+
+    # note the current number of nodes held for later expansion, or on the current path for depth first searches
+    def track_frontier(self, size: int) -> None:
+        if size > self.peak_frontier:
+            self.peak_frontier = size
+
+    def __str__(self):
+        return f"expanded {self.expanded} nodes, generated {self.generated} nodes, peak frontier {self.peak_frontier}"
+
 
 # A search node wraps the puzzle state to provide neighbor calculations.
 class SearchNode:
@@ -169,26 +353,37 @@ class SearchNode:
         return neighbors
 
 
-# Search for goal using breadth first search, return a list of PuzzleStates starting with start and ending with goal
-def breadth_first_search(start: PuzzleState, goal: PuzzleState) -> List[PuzzleState]:
-    front = [start]
+# Search for goal using breadth first search, return a list of PuzzleStates starting with start and ending with goal.
+# Node counts are added to stats.
+def breadth_first_search(start: PuzzleState, goal: PuzzleState, stats: SearchStats = None) -> List[PuzzleState]:
+    if stats is None:
+        stats = SearchStats()
+    if not start.is_solvable(goal):
+        return []
+    if start == goal:
+        return [start]
+    front = deque([start])
     parents = {}
     visited = set()
 
-    node = front.pop()
+    node = front.popleft()
+    stats.generated += 1
 
     while node != goal:
+        stats.expanded += 1
         neighbors = [x for x in SearchNode(node).neighbors() if x not in visited]
+        stats.generated += len(neighbors)
 
         # Adding this line to attempt to maintain fairness between bfs and dfs
         #neighbors.sort(key=lambda x: x.get_heuristic_weight(goal))
         if neighbors:
-            front = neighbors + front
+            front.extend(reversed(neighbors))
+            stats.track_frontier(len(front))
             for c in neighbors:
                 visited.add(c)
                 if c not in parents:
                     parents[c] = node
-        node = front.pop()
+        node = front.popleft()
 
     path = [goal]
 
@@ -201,95 +396,442 @@ def breadth_first_search(start: PuzzleState, goal: PuzzleState) -> List[PuzzleSt
     return list(reversed(path))
 
 
-# using psuedo code from https://www.geeksforgeeks.org/iterative-deepening-searchids-iterative-deepening-depth-first-searchiddfs/
-
-# Use iterative deepening depth first search to find a path from start state to goal state
-# return the path taken to reach goal, or empty list if path does not exist.
-def iterative_deepening_depth_first_search(start: PuzzleState, goal: PuzzleState) -> List[PuzzleState]:
-    parents = {}
-    visited = set()
-    MAX_DEPTH = 100000 #Pythons max recusion size is 1000 anyways...
-
-    # depth limited search inner recursive function
-    def dls(cstart: PuzzleState, cgoal: PuzzleState, climit: int):
-
-        visited.add(cstart)
-        if cstart == cgoal:
-            return True
-
-        if climit <= 0:
-            return False
-
-        neighbors = SearchNode(cstart).neighbors()
-
-        # --------------------------------------------------------------------------------------------------------------
-        # Must add this line to avoid stack overflow.
-        # have tried raising stack size, cant get that to happen. Am keeping track of neighbors that have been
-        # visited, some solutions just require a larger stack than python will let me have. Well aware that this skews
-        # search times and would prefer to not use this hack.
-        #neighbors.sort(key=lambda x: x.get_heuristic_weight(goal))
-        # --------------------------------------------------------------------------------------------------------------
-
-        for neighbor in neighbors:
-            if neighbor not in parents:
-                parents[neighbor] = cstart
-            if neighbor not in visited:
-                if dls(neighbor, cgoal, climit - 1):
-                    return True
-
-    found = False
-    for limit in range(0, MAX_DEPTH):
-        visited = set()
-        if dls(start, goal, limit):
-            found = True
-            if WANT_APROX_DEPTH:
-                depths.append(limit)
-            break
-
-    if found:
-        path = [goal]
-        node = parents[goal]
-        while node != start:
-            path.append(node)
-            node = parents[node]
-        path.append(start)
-        return list(reversed(path))
-    else:
+# Search for goal by running breadth first search from both ends at once. Each round expands one whole layer of
+# whichever frontier is smaller, the round that first touches the other side's visited states picks the shortest
+# join among them. Node counts are added to stats.
+# return a list of PuzzleStates starting with start and ending with goal, or empty list if path does not exist.
+def bidirectional_breadth_first_search(start: PuzzleState, goal: PuzzleState,
+                                       stats: SearchStats = None) -> List[PuzzleState]:
+    if stats is None:
+        stats = SearchStats()
+    if not start.is_solvable(goal):
         return []
-
-
-def a_star_search(start: PuzzleState, goal: PuzzleState) -> List[PuzzleState]:
-    front = [start]
-    visited = [start]
-    parents = {}
-
-    def a_star(front, visited, goal):
-        if len(front) == 0:
-            return False
-        node = front.pop()
-        if node != goal:
-            visited.append(node),
+    if start == goal:
+        return [start]
+
+    forward = (deque([start]), {start: None}, {start: 0})
+    backward = (deque([goal]), {goal: None}, {goal: 0})
+    stats.generated += 2
+
+    while forward[0] and backward[0]:
+        this, other = (forward, backward) if len(forward[0]) <= len(backward[0]) else (backward, forward)
+        front, parents, distances = this
+        other_distances = other[2]
+
+        meeting = None
+        best = sys.maxsize
+        for _ in range(len(front)):
+            node = front.popleft()
+            stats.expanded += 1
             for neighbor in SearchNode(node).neighbors():
-                if neighbor not in visited:
-                    front.append(neighbor)
-                    if neighbor not in parents:
-                        parents[neighbor] = node
+                if neighbor in parents:
+                    continue
+                parents[neighbor] = node
+                distances[neighbor] = distances[node] + 1
+                front.append(neighbor)
+                stats.generated += 1
+                stats.track_frontier(len(front) + len(other[0]))
+                if neighbor in other_distances and distances[neighbor] + other_distances[neighbor] < best:
+                    best = distances[neighbor] + other_distances[neighbor]
+                    meeting = neighbor
+
+        if meeting is not None:
+            path = []
+            node = meeting
+            while node is not None:
+                path.append(node)
+                node = forward[1][node]
+            path.reverse()
+            node = backward[1][meeting]
+            while node is not None:
+                path.append(node)
+                node = backward[1][node]
+            return path
+
+    return []
+
+
+# Use iterative deepening depth first search to find a path from start state to goal state.
+# Each depth limited pass is an explicit stack walk over a single flat tile list that is moved and undone in
+# place, so there is no recursion limit. Cycles are cut by refusing any board already on the current path, tracked
+# by packed code, and moving the blank straight back is skipped. Node counts are added to stats.
+# return the path taken to reach goal, or empty list if path does not exist.
+def iterative_deepening_depth_first_search(start: PuzzleState, goal: PuzzleState,
+                                           stats: SearchStats = None) -> List[PuzzleState]:
+    if stats is None:
+        stats = SearchStats()
+    if not start.is_solvable(goal):
+        return []
+    MAX_DEPTH = 100000
 
-            front.sort(key=lambda x: x.get_heuristic_weight(goal), reverse=True)
-            a_star(front, visited, goal)
-        else:
-            return True
+    cells = start.size * start.size
+    bits = max(1, (cells - 1).bit_length())
+    tiles = [tile if tile != PuzzleState.BLANK else 0 for tile in start.tile_list()]
+    moves = [start.neighbor_indexes(index) for index in range(cells)]
+    goal_code = goal.code
 
-    a_star(front, visited, goal)
+    code = start.code
+    blank_row, blank_col = start.get_blank_node()
+    blank_path = [blank_row * start.size + blank_col]
+    next_move = [0]
+    on_path = {code}
+    stats.generated += 1
 
+    for limit in range(0, MAX_DEPTH):
+        if code == goal_code:
+            return replay_blank_moves(start, blank_path)
+
+        while True:
+            blank = blank_path[-1]
+            depth = len(blank_path) - 1
+            options = moves[blank]
+            move = next_move[-1]
+
+            if depth < limit and move < len(options):
+                if move == 0:
+                    stats.expanded += 1
+                next_move[-1] = move + 1
+                index = options[move]
+                if depth > 0 and index == blank_path[-2]:
+                    continue
+                tile = tiles[index]
+                new_code = code + (tile << (blank * bits)) - (tile << (index * bits))
+                if new_code in on_path:
+                    continue
+
+                tiles[blank] = tile
+                tiles[index] = 0
+                code = new_code
+                on_path.add(code)
+                blank_path.append(index)
+                next_move.append(0)
+                stats.generated += 1
+                stats.track_frontier(len(blank_path))
+
+                if code == goal_code:
+                    return replay_blank_moves(start, blank_path)
+                continue
+
+            if depth == 0:
+                next_move[0] = 0
+                break
+
+            # undo the move that led here
+            blank_path.pop()
+            next_move.pop()
+            on_path.remove(code)
+            previous = blank_path[-1]
+            tile = tiles[previous]
+            tiles[blank] = tile
+            tiles[previous] = 0
+            code = code - (tile << (previous * bits)) + (tile << (blank * bits))
+
+    return []
+
+
+# walk the parents map back from goal to start, return the path starting with start and ending with goal
+def trace_path(parents: Dict[PuzzleState, PuzzleState], start: PuzzleState, goal: PuzzleState) -> List[PuzzleState]:
     path = [goal]
-    node = parents[goal]
+    node = goal
     while node != start:
-        path.append(node)
         node = parents[node]
-    path.append(start)
+        path.append(node)
+    return list(reversed(path))
+
+
+# Use A* to find a shortest path from start state to goal state. The frontier is a heap ordered by
+# f = g + h with ties going to the deeper node, expanded states go into a closed set. heuristic is called as
+# heuristic(state, goal), any of the PuzzleState weight methods can be passed. Node counts are added to stats.
+# return the path taken to reach goal, or empty list if path does not exist.
+def a_star_search(start: PuzzleState, goal: PuzzleState,
+                  heuristic: Callable[[PuzzleState, PuzzleState], int] = PuzzleState.get_heuristic_weight,
+                  stats: SearchStats = None) -> List[PuzzleState]:
+    if stats is None:
+        stats = SearchStats()
+    if not start.is_solvable(goal):
+        return []
 
-    return reversed(path)
+    tie_breaker = itertools.count()
+    front = [(heuristic(start, goal), 0, next(tie_breaker), start)]
+    g_costs = {start: 0}
+    parents = {}
+    closed = set()
+    stats.generated += 1
+
+    while front:
+        _, neg_g, _, node = heapq.heappop(front)
+        if node in closed:
+            continue
+        if node == goal:
+            return trace_path(parents, start, goal)
+
+        closed.add(node)
+        stats.expanded += 1
+        g = 1 - neg_g
+        for neighbor in SearchNode(node).neighbors():
+            if neighbor in closed or g >= g_costs.get(neighbor, g + 1):
+                continue
+            g_costs[neighbor] = g
+            parents[neighbor] = node
+            heapq.heappush(front, (g + heuristic(neighbor, goal), -g, next(tie_breaker), neighbor))
+            stats.generated += 1
+            stats.track_frontier(len(front))
+
+    return []
+
+
+# turn a list of flat blank indexes, starting at the blank of start, into the list of states the blank passes through
+def replay_blank_moves(start: PuzzleState, blank_path: List[int]) -> List[PuzzleState]:
+    path = [start]
+    for index in blank_path[1:]:
+        state = path[-1].copy()
+        state.swap_with_blank(divmod(index, state.size))
+        path.append(state)
+    return path
+
+
+# Manhattan distance as additive tables for ida_star_search, one group per tile where
+# table[index] is how far the tile sitting at flat index is from its goal index
+def manhattan_tables(goal: PuzzleState) -> List[Tuple[List[int], List[int]]]:
+    tables = []
+    for goal_index, tile in enumerate(goal.tile_list()):
+        if tile != PuzzleState.BLANK:
+            goal_row, goal_col = divmod(goal_index, goal.size)
+            table = []
+            for index in range(goal.size * goal.size):
+                row, col = divmod(index, goal.size)
+                table.append(goal.axis_distance(row, goal_row) + goal.axis_distance(col, goal_col))
+            tables.append(([tile], table))
+    return tables
+
+
+# Use IDA* to find a shortest path from start state to goal state. Each iteration is a depth first search cut off
+# once g + h passes the bound, the next bound is the smallest f that was cut off. A single flat tile list is moved
+# and undone in place and moving the blank straight back is skipped, so memory stays proportional to the solution
+# length. The heuristic is a sum of additive tables, each a (tiles, table) pair where table is indexed by
+# sum(position of tiles[i] * cells ** i), so a move only updates the table of the tile that moved.
+# pattern_tables defaults to the Manhattan distance. Node counts are added to stats.
+# return the path taken to reach goal, or empty list if path does not exist.
+def ida_star_search(start: PuzzleState, goal: PuzzleState, stats: SearchStats = None,
+                    pattern_tables: List[Tuple[List[int], List[int]]] = None) -> List[PuzzleState]:
+    if stats is None:
+        stats = SearchStats()
+    if not start.is_solvable(goal):
+        return []
+    if pattern_tables is None:
+        pattern_tables = manhattan_tables(goal)
+
+    cells = start.size * start.size
+    tiles = [tile if tile != PuzzleState.BLANK else 0 for tile in start.tile_list()]
+    moves = [start.neighbor_indexes(index) for index in range(cells)]
+
+    # for every tile the table it belongs to and the weight of its position in that table's index
+    tile_table = [0] * cells
+    tile_weight = [0] * cells
+    tables = [[0]]
+    indexes = [0]
+    for group_tiles, table in pattern_tables:
+        index = 0
+        for i, tile in enumerate(group_tiles):
+            tile_table[tile] = len(tables)
+            tile_weight[tile] = cells ** i
+            index += tiles.index(tile) * cells ** i
+        tables.append(table)
+        indexes.append(index)
+
+    blank_path = [tiles.index(0)]
+    found = -1
+
+    # depth first search below the bound, return found or the smallest f that went over the bound
+    def search(g: int, bound: int, h: int, blank: int, prev: int) -> int:
+        f = g + h
+        if f > bound:
+            return f
+        if tiles == goal_tiles:
+            return found
+
+        stats.expanded += 1
+        minimum = sys.maxsize
+        for index in moves[blank]:
+            if index == prev:
+                continue
+            tile = tiles[index]
+            group = tile_table[tile]
+            table = tables[group]
+            old_index = indexes[group]
+            new_index = old_index + (blank - index) * tile_weight[tile]
+            tiles[blank] = tile
+            tiles[index] = 0
+            indexes[group] = new_index
+            blank_path.append(index)
+            stats.generated += 1
+            stats.track_frontier(len(blank_path))
+
+            result = search(g + 1, bound, h - table[old_index] + table[new_index], index, blank)
+            if result == found:
+                return found
+
+            blank_path.pop()
+            indexes[group] = old_index
+            tiles[blank] = 0
+            tiles[index] = tile
+            minimum = min(minimum, result)
+        return minimum
+
+    goal_tiles = [tile if tile != PuzzleState.BLANK else 0 for tile in goal.tile_list()]
+    h = sum(table[index] for table, index in zip(tables, indexes))
+    bound = h
+    while bound != sys.maxsize:
+        bound = search(0, bound, h, blank_path[0], -1)
+        if bound == found:
+            return replay_blank_moves(start, blank_path)
+
+    return []
+
+# rank of a permutation of 0..n-1 among all n! permutations in lexicographic order
+def permutation_rank(values: List[int]) -> int:
+    n = len(values)
+    rank = 0
+    remaining = (1 << n) - 1
+    for i, value in enumerate(values):
+        rank += (remaining & ((1 << value) - 1)).bit_count() * math.factorial(n - 1 - i)
+        remaining &= ~(1 << value)
+    return rank
+
+
+# The part of a stored table's file name naming the board shape and goal, such as 3x3w_1-2-3-4-5-6-7-8-B
+def goal_file_key(goal: PuzzleState) -> str:
+    shape = f"{goal.size}x{goal.size}{'w' if goal.wrap else ''}"
+    return f"{shape}_{'-'.join(str(tile) if tile != PuzzleState.BLANK else 'B' for tile in goal.tile_list())}"
+
+
+# the goal board as written in a stored table's header, one byte per cell with the blank as 0
+def goal_to_bytes(goal: PuzzleState) -> bytes:
+    return bytes(tile if tile != PuzzleState.BLANK else 0 for tile in goal.tile_list())
+
+
+# read back a goal board written by goal_to_bytes from data at offset
+def goal_from_bytes(data, offset: int, size: int, wrap: bool) -> PuzzleState:
+    goal_tiles = [tile if tile != 0 else PuzzleState.BLANK for tile in data[offset:offset + size * size]]
+    return PuzzleState([goal_tiles[i:i + size] for i in range(0, size * size, size)], bool(wrap))
+
+
+# Exact number of moves to goal for every board, found once by breadth first search backwards from the goal.
+# A board is stored at the rank of its permutation relative to the goal (each tile replaced by its goal index),
+# so the table is a perfect hash with one byte per permutation. Boards that cannot reach the goal hold UNREACHABLE.
+# With 9! entries this is only practical for 3x3 boards.
+class DistanceTable:
+    UNREACHABLE = 255
+    MAGIC = b'SPDT'
+    HEADER = struct.Struct('<4sBB')
+    DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'distance_tables')
+
+    def __init__(self, goal: PuzzleState, table):
+        self.goal = goal
+        self.table = table
+        self._goal_index = {tile: index for index, tile in enumerate(goal.tile_list())}
+        self._mapped = None
+
+    # breadth first search out from goal over every board, recording each board's depth
+    @classmethod
+    def build(cls, goal: PuzzleState) -> 'DistanceTable':
+        cells = goal.size * goal.size
+        moves = [goal.neighbor_indexes(index) for index in range(cells)]
+        table = bytearray([cls.UNREACHABLE]) * math.factorial(cells)
+
+        # boards are kept as tuples of goal indexes, so the goal is 0..cells-1 and the blank is its goal index
+        goal_blank = goal.tile_list().index(PuzzleState.BLANK)
+        start = tuple(range(cells))
+        table[permutation_rank(start)] = 0
+        front = deque([(start, goal_blank)])
+        while front:
+            board, blank = front.popleft()
+            depth = table[permutation_rank(board)] + 1
+            for index in moves[blank]:
+                neighbor = list(board)
+                neighbor[blank], neighbor[index] = neighbor[index], neighbor[blank]
+                rank = permutation_rank(neighbor)
+                if table[rank] == cls.UNREACHABLE:
+                    table[rank] = depth
+                    front.append((tuple(neighbor), index))
+
+        return cls(goal, table)
+
+    # the file the table for goal is stored in inside directory
+    @classmethod
+    def file_name(cls, goal: PuzzleState, directory: str) -> str:
+        return os.path.join(directory, f"{goal_file_key(goal)}.dist")
+
+    # write the header, goal board and table bytes to path
+    def save(self, path: str) -> None:
+        with open(path, 'wb') as out_file:
+            out_file.write(self.HEADER.pack(self.MAGIC, self.goal.size, self.goal.wrap))
+            out_file.write(goal_to_bytes(self.goal))
+            out_file.write(self.table)
+
+    # memory map a table written by save
+    @classmethod
+    def load(cls, path: str) -> 'DistanceTable':
+        with open(path, 'rb') as in_file:
+            mapped = mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, size, wrap = cls.HEADER.unpack_from(mapped, 0)
+        if magic != cls.MAGIC:
+            raise Exception(f"Not a distance table. {path}")
+
+        offset = cls.HEADER.size
+        goal = goal_from_bytes(mapped, offset, size, wrap)
+        offset += size * size
+        table = cls(goal, memoryview(mapped)[offset:])
+        table._mapped = mapped
+        return table
+
+    # memory map the table for goal from directory, building and saving it first if it is missing
+    @classmethod
+    def load_or_build(cls, goal: PuzzleState, directory: str = DEFAULT_DIRECTORY) -> 'DistanceTable':
+        path = cls.file_name(goal, directory)
+        if not os.path.exists(path):
+            os.makedirs(directory, exist_ok=True)
+            cls.build(goal).save(path)
+        return cls.load(path)
+
+    # number of moves from state to goal, None if goal cannot be reached
+    def distance(self, state: PuzzleState) -> int:
+        depth = self.table[permutation_rank([self._goal_index[tile] for tile in state.tile_list()])]
+        return None if depth == self.UNREACHABLE else depth
+
+    # whether goal can be reached from state
+    def is_solvable(self, state: PuzzleState) -> bool:
+        return self.distance(state) is not None
+
+    # a neighbor of state one move closer to goal, None if state is the goal or cannot reach it
+    def best_move(self, state: PuzzleState) -> PuzzleState:
+        depth = self.distance(state)
+        if not depth:
+            return None
+        for neighbor in SearchNode(state).neighbors():
+            if self.distance(neighbor) == depth - 1:
+                return neighbor
+
+    # an optimal path from start to goal in the same form as the searches, or empty list if there is none
+    def solve(self, start: PuzzleState) -> List[PuzzleState]:
+        if not self.is_solvable(start):
+            return []
+        path = [start]
+        while path[-1] != self.goal:
+            path.append(self.best_move(path[-1]))
+        return path
+
+    # the exact heuristic, in the same form as PuzzleState.get_heuristic_weight
+    def __call__(self, state: PuzzleState, goal: PuzzleState) -> int:
+        return self.distance(state)
+
+    # number of boards at every depth from goal
+    def depth_distribution(self) -> Dict[int, int]:
+        counts = [0] * 256
+        for depth in self.table:
+            counts[depth] += 1
+        return {depth: count for depth, count in enumerate(counts) if count and depth != self.UNREACHABLE}
 
 
 problems = [
@@ -323,10 +865,11 @@ problems = [
 # Take a list of board states that would be printed in sequence vertically in console and make them all printed
 # on the same row with arrows in between to nicely display a path. Will return a string ready to print to console
 def vertical_path_to_horizontal(iterator: List) -> str:
-    rows = [[] for _ in range(5)]
+    rows = []
     board_num = 0
     for board in iterator:
         row = str(board).split('\n')
+        rows.extend([] for _ in range(len(row) - len(rows)))
         for i in range(len(row)):
             rows[i].append(row[i])
         board_num += 1
@@ -344,8 +887,9 @@ def vertical_path_to_horizontal(iterator: List) -> str:
 # func is the sorting function {bfs, dldfs, a*} and args is a list containing start state and end state in that order
 def time_n_print_solve(label: str, func: Callable, args: Tuple[PuzzleState, PuzzleState]):
     tic = time.perf_counter()
-    solution = vertical_path_to_horizontal(func(*args))
+    path = func(*args)
     toc = time.perf_counter()
+    solution = vertical_path_to_horizontal(path)
 
     out = []
     out.append('-' * 180)
@@ -359,34 +903,147 @@ def time_n_print_solve(label: str, func: Callable, args: Tuple[PuzzleState, Puzz
     out.append('-' * 180)
     return toc - tic, '\n'.join(out)
 
-def make_random_puzzle():
-    spaces = [1, 2, 3, 4, 5, 6, 7, 8, -1]
+# make the solved board, tiles in order with the blank in the bottom right corner
+def make_goal_puzzle(size: int = PuzzleState.DEFAULT_BOARD_SIZE, wrap: bool = PuzzleState.WRAP_EDGES) -> PuzzleState:
+    spaces = list(range(1, size * size)) + [PuzzleState.BLANK]
+    return PuzzleState([spaces[i:i + size] for i in range(0, size * size, size)], wrap)
+
+
+# make a random board. Shuffling alone gives an unsolvable board half the time, so unless solvable_only is
+# turned off two tiles are swapped when needed to make goal (the solved board by default) reachable.
+def make_random_puzzle(size: int = PuzzleState.DEFAULT_BOARD_SIZE, wrap: bool = PuzzleState.WRAP_EDGES,
+                       goal: PuzzleState = None, solvable_only: bool = True) -> PuzzleState:
+    spaces = list(range(1, size * size)) + [PuzzleState.BLANK]
 
     random.shuffle(spaces)
-    spaces = [spaces[0:3],spaces[3:6],spaces[6:9]]
+    puzzle = PuzzleState([spaces[i:i + size] for i in range(0, size * size, size)], wrap)
+
+    if solvable_only and not puzzle.is_solvable(goal if goal is not None else make_goal_puzzle(size, wrap)):
+        tiles = [i for i, val in enumerate(spaces) if val != PuzzleState.BLANK]
+        first, second = tiles[0], tiles[1]
+        spaces[first], spaces[second] = spaces[second], spaces[first]
+        puzzle = PuzzleState([spaces[i:i + size] for i in range(0, size * size, size)], wrap)
+
+    return puzzle
+
+
+# make a random board whose shortest solution is exactly `depth` moves, for benchmarks that need controlled
+# difficulty. Walks out from goal, each step moving to a random neighbor one move further away than the last and
+# backing up when a board has no such neighbor. A board backed out of can not lead to depth by any walk, so it is
+# never tried again. Distances come from the DistanceTable on 3x3 boards, which also rules out a depth past its
+# deepest board straight away, and from ida_star_search on bigger ones.
+def make_random_puzzle_at_depth(depth: int, size: int = PuzzleState.DEFAULT_BOARD_SIZE,
+                                wrap: bool = PuzzleState.WRAP_EDGES, goal: PuzzleState = None) -> PuzzleState:
+    if goal is None:
+        goal = make_goal_puzzle(size, wrap)
+
+    if size == PuzzleState.DEFAULT_BOARD_SIZE:
+        table = DistanceTable.load_or_build(goal)
+        if depth > max(table.depth_distribution()):
+            raise Exception(f"No board at depth {depth}.")
+        distance = table.distance
+    else:
+        distance = lambda state: len(ida_star_search(state, goal)) - 1
+
+    known = {goal: 0}
+    exhausted = set()
+    # candidates[i] holds the untried boards at distance i + 1 next to walked[i], the board reached after i steps
+    candidates = []
+    walked = []
+    state = goal
+    while len(candidates) < depth:
+        further = []
+        for neighbor in SearchNode(state).neighbors():
+            if neighbor not in known:
+                known[neighbor] = distance(neighbor)
+            if known[neighbor] == len(candidates) + 1 and neighbor not in exhausted:
+                further.append(neighbor)
+        random.shuffle(further)
+        candidates.append(further)
+        walked.append(state)
+
+        while candidates and not candidates[-1]:
+            candidates.pop()
+            exhausted.add(walked.pop())
+        if not candidates:
+            raise Exception(f"No board at depth {depth}.")
+        state = candidates[-1].pop()
+
+    return state
+
+
+# searches that can be picked by name for batch solving, each called as algorithm(start, goal, stats)
+ALGORITHMS = {
+    "BFS": breadth_first_search,
+    "BiBFS": bidirectional_breadth_first_search,
+    "IDDFS": iterative_deepening_depth_first_search,
+    "A*": lambda start, goal, stats: a_star_search(start, goal, PuzzleState.get_linear_conflict_weight, stats),
+    "IDA*": ida_star_search,
+}
+
+
+# solve one batch job (id, algorithm name, start, goal) and describe the result as a json friendly dict
+def solve_instance(job: Tuple[int, str, PuzzleState, PuzzleState]) -> Dict:
+    instance_id, algorithm, start, goal = job
+    stats = SearchStats()
+    tic = time.perf_counter()
+    path = ALGORITHMS[algorithm](start, goal, stats)
+    toc = time.perf_counter()
 
-    return PuzzleState(spaces)
+    return {
+        "id": instance_id,
+        "algorithm": algorithm,
+        "start": start.tile_list(),
+        "moves": len(path) - 1 if path else None,
+        "seconds": toc - tic,
+        "expanded": stats.expanded,
+        "generated": stats.generated,
+        "peak_frontier": stats.peak_frontier,
+    }
+
+
+# Solve many (start, goal) instances with one algorithm spread over a pool of processes. Results are written to
+# out_path as json lines in the order they finish, so a long batch can be followed while it runs.
+# return the results sorted by instance id and the throughput in instances per second
+def solve_batch(instances: List[Tuple[PuzzleState, PuzzleState]], algorithm: str = "IDA*", out_path: str = None,
+                processes: int = None) -> Tuple[List[Dict], float]:
+    jobs = [(i, algorithm, start, goal) for i, (start, goal) in enumerate(instances)]
+    results = []
+    out_file = open(out_path, 'w') if out_path is not None else None
 
+    tic = time.perf_counter()
+    try:
+        with multiprocessing.Pool(processes) as pool:
+            for result in pool.imap_unordered(solve_instance, jobs):
+                results.append(result)
+                if out_file is not None:
+                    out_file.write(json.dumps(result) + "\n")
+                    out_file.flush()
+    finally:
+        if out_file is not None:
+            out_file.close()
+    toc = time.perf_counter()
+
+    results.sort(key=lambda result: result["id"])
+    return results, len(results) / (toc - tic) if results else 0.0
 
-def approximate_average_depth():
-    # Generate random boards
-    # run iterative deepening on all of them
-    # record depth of solution
-    # find average depth of all solutions
 
-    goal = PuzzleState([[1, 2, 3], [4, 5, 6], [7, 8, -1]])
-    
-    for trial in range(100):    
-        problem = make_random_puzzle()
-        iterative_deepening_depth_first_search(problem, goal)
-        print(depths[-1])
-    print(sum(depths)/len(depths))
+# Report how many boards sit at every solution depth and the average depth, read exactly off the distance table
+# instead of sampling random boards with iterative deepening
+def approximate_average_depth(table: DistanceTable = None):
+    if table is None:
+        table = DistanceTable.load_or_build(make_goal_puzzle())
 
-approximate_average_depth()
+    distribution = table.depth_distribution()
+    for depth, count in distribution.items():
+        print(f"{depth} -> {count}")
+    total = sum(distribution.values())
+    print(sum(depth * count for depth, count in distribution.items()) / total)
 
 def run_algos():
 
-    algs = {"BFS": breadth_first_search, "IDDFS": iterative_deepening_depth_first_search, "A*": a_star_search}
+    algs = {"BFS": breadth_first_search, "BiBFS": bidirectional_breadth_first_search,
+            "IDDFS": iterative_deepening_depth_first_search, "A*": a_star_search}
 
     times = {label: [] for label in algs.keys()}
     results = {label: [] for label in algs.keys()}
@@ -408,3 +1065,7 @@ def run_algos():
             avg_time = sum(time_vals) / len(time_vals)
             print(f"{label} -> {str(avg_time)}")
             out_file.write(f"{label} -> {str(avg_time)}\n")
+
+
+if __name__ == '__main__':
+    approximate_average_depth()
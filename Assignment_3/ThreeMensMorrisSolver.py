@@ -1,5 +1,4 @@
-import itertools, math, time
-from operator import add
+import functools, itertools, math, multiprocessing, operator, random, time
 from typing import List, Tuple
 BLANK = 0
 PLAYER_1 = 1
@@ -17,6 +16,19 @@ WIN_LINES =  [
         [(0,0),(1,1),(2,2)],
         [(0,2),(1,1),(2,0)],
         ]
+
+# the steps a piece on each point may take along the board's lines once every piece is placed
+MOVE_DELTAS = {
+    (0,0): [(1,0), (1, 1), (0, 1)],
+    (1,0): [(-1,0), (1, 0), (0,1)],
+    (2,0): [(-1,0), (-1, 1), (0,1)],
+    (0,1): [(0,-1), (1, 0), (0,1)],
+    (1,1):[(-1,1), (0,1), (1,1), (1, 0), (1,-1), (0,-1), (-1,-1), (-1, 0)],
+    (2,1): [(0,-1), (-1, 0), (0,1)],
+    (0,2): [(1,-1), (1, 0), (0,-1)],
+    (1,2):[(-1,0), (1, 0), (0,-1)],
+    (2,2): [(0,-1), (-1, 0),(-1,-1)],
+    }
 #Generate a blank boardd
 def make_board() -> List[List[int]] :
     return [[BLANK,BLANK,BLANK],[BLANK,BLANK,BLANK],[BLANK,BLANK,BLANK]]
@@ -55,64 +67,23 @@ def print_board(board:List[List[int]] , indent: int = 0, console: bool = True) -
     
     return joiner.join(out)
 
-#check if a player occupies all of a single win line, returns a winning player ID
+#check if a player occupies all of a single win line, returns a winning player ID, read from the bitboard tables
 def check_wins(board: List[List[int]]) -> int:
-    
-    for line in WIN_LINES:
-        vals = set()
-        for x,y in line:
-            vals.add(board[x][y])
-        val = next(iter(vals))
-        if len(vals) == 1 and val != BLANK:
-            return val
-    else:
-        return None
-
-#Calculate the difference in moves to win heuristic
-def get_pieces(board: List[List[int]], player: int) -> List[Tuple[int,int]]:
-    pieces = []
-    for i,j in itertools.product(range(3), range(3)):
-        if board[i][j] == player:
-            pieces.append((i,j))
-    return pieces
-
-#get the location for all pieces on the board, return a list of possible next boards
+    p1, p2 = board_to_bits(board)
+    if IS_WIN[p1]:
+        return PLAYER_1
+    if IS_WIN[p2]:
+        return PLAYER_2
+    return None
+
+#return a list of possible next boards, the moves are made on the bitboards by bit_moves
 def make_neighbors(board: List[List[int]], active_player: int) -> List[List[List[int]]]:
     if check_wins(board):
         return [board]
-    neighbors = []
-    occurances = get_pieces(board, active_player)
-    if len(occurances) < 3: #TODO HERE
-        for i,j in itertools.product(range(3), range(3)):
-            if board[i][j] == BLANK:
-                neighbor = copy_board(board)
-                neighbor[i][j] = active_player
-                neighbors.append(neighbor)
-    else:
-        deltas = {
-            (0,0): [(1,0), (1, 1), (0, 1)], #Good
-            (1,0): [(-1,0), (1, 0), (0,1)], #Good
-            (2,0): [(-1,0), (-1, 1), (0,1)], #Good
-            (0,1): [(0,-1), (1, 0), (0,1)], #Good
-            (1,1):[(-1,1), (1,0), (1,1), (1, 0), (1,-1), (0,-1), (-1,-1), (-1, 0)],
-            (2,1): [(0,-1), (-1, 0), (0,1)], #Good
-            (0,2): [(1,-1), (1, 0), (0,-1)], 
-            (1,2):[(-1,0), (1, 0), (0,-1)],
-            (2,2): [(0,-1), (-1, 0),(-1,-1)], 
-            }
-        new_positions = set()
-        for occurance in occurances:
-            for delta in deltas[occurance]:
-                new_pos = tuple(map(add, occurance, delta ))
-                if 0 <= new_pos[0] < 3 and 0 <= new_pos[1] < 3 and board[new_pos[0]][new_pos[1]] == BLANK:
-                    new_positions.add((occurance, new_pos))
-        for start, end in iter(new_positions):
-            new_board = copy_board(board)
-            new_board[start[0]][start[1]] = BLANK
-            new_board[end[0]][end[1]] = active_player
-            neighbors.append(new_board)
-        
-    return neighbors
+    p1, p2 = board_to_bits(board)
+    if active_player == PLAYER_1:
+        return [bits_to_board(move, p2) for move in bit_moves(p1, p2)]
+    return [bits_to_board(p1, move) for move in bit_moves(p2, p1)]
 
 #pretty print a list of boards
 def vertical_path_to_horizontal(iterator: List[str]) -> str:
@@ -132,11 +103,25 @@ def vertical_path_to_horizontal(iterator: List[str]) -> str:
         row_num += 1
     return '\n'.join(printable_rows)
 
-# a node in the search space. Used to eliminate cycles
+# Zobrist keys, a random 64 bit number per point and piece and one for the maxing player to move. A position hashes
+# to the xor of the keys of its pieces, so a move changes the hash by xoring in just the points it changed.
+_zobrist_random = random.Random(3030)
+ZOBRIST = [[0, _zobrist_random.getrandbits(64), _zobrist_random.getrandbits(64)] for _ in range(9)]
+ZOBRIST_MAXING = _zobrist_random.getrandbits(64)
+
+# the Zobrist hash of a board and whose turn it is
+def zobrist_hash(board: List[List[int]], maxing: bool) -> int:
+    return bit_hash(*board_to_bits(board), maxing)
+
+# a node in the search space. Used to eliminate cycles.
+# Every node of one search shares a single path set holding the hashes of the nodes the search is currently inside,
+# pushed on the way down and popped on the way back up, so checking for a repeated position is one set lookup.
 class Node:
-    def __init__(self, board: List[List[int]], maxing:bool = True, depth: int = 0) -> 'Node':
+    def __init__(self, board: List[List[int]], maxing:bool = True, depth: int = 0, path: set = None,
+                 hash: int = None) -> 'Node':
         self.board = board
-        self.parents = {}
+        self.path = set() if path is None else path
+        self.hash = zobrist_hash(board, maxing) if hash is None else hash
         self.value = None
         self.children = []
         self.maxing = maxing
@@ -144,13 +129,36 @@ class Node:
         self.favorite_child = None
 
     # make a child for the current board with iterating depth, alternating maxing, 
-    # and copied parents
-    def make_child_with_board(self, board: List[List[int]]) -> 'Node':
-        child = Node(board, maxing = not self.maxing, depth= self.depth + 1)
-        child.parents= self.parents.copy()
-        child.parents[str(self)] = self
-        self.children.append(child)
+    # the shared path set and its hash updated from this node's. Unless keep the child is not added to children
+    def make_child_with_board(self, board: List[List[int]], keep: bool = True) -> 'Node':
+        child = Node(board, maxing = not self.maxing, depth= self.depth + 1, path=self.path,
+                     hash=self.child_hash(board))
+        if keep:
+            self.children.append(child)
         return child
+
+    # hang a line of boards below this node as its chain of favorite children
+    def set_favorite_path(self, line: List[List[List[int]]]) -> None:
+        node = self
+        for board in line:
+            node.favorite_child = node.make_child_with_board(board)
+            node = node.favorite_child
+
+    # the hash of board with the other player to move, from this node's hash and the points that differ
+    def child_hash(self, board: List[List[int]]) -> int:
+        hash = self.hash ^ ZOBRIST_MAXING
+        for row, col in itertools.product(range(3), range(3)):
+            if board[row][col] != self.board[row][col]:
+                hash ^= ZOBRIST[row * 3 + col][self.board[row][col]] ^ ZOBRIST[row * 3 + col][board[row][col]]
+        return hash
+
+    # mark this node as being searched below
+    def push(self) -> None:
+        self.path.add(self.hash)
+
+    # done searching below this node
+    def pop(self) -> None:
+        self.path.discard(self.hash)
     
     #two nodes are equal if they have the same board and same maxing player
     def __eq__(self, other: 'Node') -> bool:
@@ -175,154 +183,639 @@ class Node:
         return path
 
 
-    # node is previous state if board and maxing pair have already happened
+    # node is previous state if board and maxing pair have already happened on the path being searched
     def is_ancestor(self,board: List[List[int]], maxing: bool) -> bool:
-        anc = str(Node(board, maxing)) in self.parents.keys()
-        return anc
+        hash = self.child_hash(board)
+        if maxing == self.maxing:
+            hash ^= ZOBRIST_MAXING
+        return hash in self.path
 
-#Calculate the difference in moves to win heuristic
+#Calculate the difference in moves to win heuristic, the win lines still open to player 1 less those open to player 2,
+#read from the bitboard tables
 def compute_diff_possible_wins(board: List[List[int]]) -> int:
-    possible_win_for_1 = 0
-    possible_win_for_2 = 0
-    for line in WIN_LINES:
-        if all([board[x][y] != PLAYER_2 for x,y in line]):
-            possible_win_for_1 += 1
-        
-        if all([board[x][y] != PLAYER_1 for x,y in line]):
-            possible_win_for_2 += 1
+    p1, p2 = board_to_bits(board)
+    return OPEN_LINES[p2] - OPEN_LINES[p1]
+
+# the 8 rotations and reflections of the board. Each is a list of the (row, col) every cell of the transformed
+# board is read from, in row major order
+SYMMETRIES = [
+    [transform(row, col) for row, col in itertools.product(range(3), range(3))]
+    for transform in [
+        lambda row, col: (row, col),
+        lambda row, col: (col, 2 - row),
+        lambda row, col: (2 - row, 2 - col),
+        lambda row, col: (2 - col, row),
+        lambda row, col: (row, 2 - col),
+        lambda row, col: (2 - row, col),
+        lambda row, col: (col, row),
+        lambda row, col: (2 - col, 2 - row),
+    ]
+]
+
+# the player whose turn it is at a node, maxing is player 1 unless player 2 is set to go first as the maxer
+def player_to_move(maxing: bool, max_is_first: bool = True) -> int:
+    if max_is_first:
+        return PLAYER_1 if maxing else PLAYER_2
+    return PLAYER_2 if maxing else PLAYER_1
+
+# canonical codes already worked out, by the base 3 number the position reads as untransformed
+canonical_codes = {}
+
+# the smallest base 3 number any rotation or reflection of the position reads as, the same for every symmetric
+# position. p1 and p2 are its bitboards
+def canonical_code(p1: int, p2: int) -> int:
+    code = TERNARY[p1] + 2 * TERNARY[p2]
+    canonical = canonical_codes.get(code)
+    if canonical is None:
+        canonical = min(TERNARY[symmetry[p1]] + 2 * TERNARY[symmetry[p2]] for symmetry in SYMMETRY_MASKS)
+        canonical_codes[code] = canonical
+    return canonical
+
+# Cache of searched positions shared between calls to minimax and alpha_beta_minimax.
+# Positions are keyed by their canonical code, the player to move and whether that player is maxing, so the 8
+# symmetric versions of a position share an entry. Each entry is (value, depth searched below it, bound, key of the
+# best child), where bound says whether value is exact or only a lower or upper bound from an alpha beta cutoff.
+# A move back into a position on the path scores a draw whatever the path was, so an entry is used wherever its
+# position comes up. As in any table over a game with repetitions, a draw found below a stored position may rest
+# on a repetition that another path to it would not make.
+# An entry searched deeper than a position needs is used as well, which can change a depth limited value. With
+# exact_depth only entries searched exactly as deep are used, so the table gives the values of the search without it.
+class TranspositionTable:
+    EXACT = 0
+    LOWER = 1
+    UPPER = 2
+
+    def __init__(self, exact_depth: bool = False):
+        self.exact_depth = exact_depth
+        self.entries = {}
+        self.probes = 0
+        self.hits = 0
+        self.cutoffs = 0
+
+    # the key a position is stored under
+    @staticmethod
+    def key(board: List[List[int]], player: int, maxing: bool) -> int:
+        return TranspositionTable.bit_key(*board_to_bits(board), player, maxing)
+
+    # the key a position is stored under from its bitboards
+    @staticmethod
+    def bit_key(p1: int, p2: int, player: int, maxing: bool) -> int:
+        return (canonical_code(p1, p2) * 3 + player) * 2 + maxing
+
+    # the entry for key or None
+    def lookup(self, key: int) -> Tuple[int, int, int, int]:
+        self.probes += 1
+        return self.entries.get(key)
+
+    # keep the result of searching depth plies below a position, unless a deeper search of it is already stored
+    def store(self, key: int, value: int, depth: int, bound: int, best: int) -> None:
+        entry = self.entries.get(key)
+        if entry is None or depth >= entry[1]:
+            self.entries[key] = (value, depth, bound, best)
+
+    # the value of an entry if it settles the search of a position depth plies deep within alpha and beta. An entry
+    # searched at least that deep, or exactly that deep with exact_depth, counts as a hit
+    def cutoff_value(self, entry: Tuple[int, int, int, int], depth: int, alpha: int, beta: int) -> int:
+        if entry is None or entry[1] < depth or (self.exact_depth and entry[1] != depth):
+            return None
+        self.hits += 1
+        value, _, bound, _ = entry
+        if bound == self.EXACT or (bound == self.LOWER and value >= beta) or (bound == self.UPPER and value <= alpha):
+            self.cutoffs += 1
+            return value
+        return None
 
-    return possible_win_for_1 - possible_win_for_2
+    # move the first of children, (p1, p2) positions, stored under the key of entry's best child to the front.
+    # player and maxing are the children's player and maxing
+    def best_first(self, children: List[Tuple[int, int]], entry: Tuple[int, int, int, int], player: int,
+                   maxing: bool) -> None:
+        for index, child in enumerate(children):
+            if self.bit_key(child[0], child[1], player, maxing) == entry[3]:
+                children.insert(0, children.pop(index))
+                return
+
+    # share of lookups that found an entry it could use
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes else 0.0
+
+    # A search that stops at a table entry leaves no favorite child there. Follow the best children stored in the
+    # table from the end of node's favorite path to rebuild the rest of it.
+    def extend_path(self, node: 'Node', max_is_first: bool = True) -> None:
+        favorite_path = node.get_favorite_path()
+        for path_node in favorite_path:
+            path_node.push()
+        last = favorite_path[-1]
+        while last.depth < MAX_DEPTH and check_wins(last.board) is None:
+            player = player_to_move(last.maxing, max_is_first)
+            entry = self.entries.get(self.key(last.board, player, last.maxing))
+            if entry is None or entry[3] is None:
+                break
+            child = next((neighbor for neighbor in make_neighbors(last.board, player)
+                          if self.key(neighbor, 3 - player, not last.maxing) == entry[3]
+                          and not last.is_ancestor(neighbor, not last.maxing)), None)
+            if child is None:
+                break
+            last.favorite_child = last.make_child_with_board(child)
+            last = last.favorite_child
+            last.push()
+        for path_node in node.get_favorite_path():
+            path_node.pop()
+
+    def __str__(self):
+        return (f"{len(self.entries)} entries, {self.probes} probes, hit rate {self.hit_rate:0.3f}, "
+                f"{self.cutoffs} cutoffs")
 
 #rate board as win loss or draw
 def rate_board(board: List[List[int]]) -> int:
-    res = check_wins(board)
-    if res == PLAYER_1:
+    return bit_rate(*board_to_bits(board))
+
+# Counters for a search
+class SearchStats:
+    def __init__(self):
+        self.nodes = 0
+        self.cutoffs = 0
+        self.seconds = 0.0
+
+    @property
+    def nodes_per_second(self) -> float:
+        return self.nodes / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return f"{self.nodes} nodes, {self.cutoffs} cutoffs, {self.nodes_per_second:0.0f} nodes/s"
+
+#minimax algorithm from a node, searched on its bitboards by bit_minimax with the node's path. table is an optional
+#TranspositionTable shared between searches. No tree is kept while searching, only the principal variation, which
+#hangs below the node as its favorite path once the search is done. stats, when given, counts the nodes searched
+def minimax(current_node: Node, table: TranspositionTable = None, stats: SearchStats = None) -> int:
+    p1, p2 = board_to_bits(current_node.board)
+    value, line = bit_minimax(p1, p2, current_node.maxing, current_node.depth, current_node.path,
+                              SearchStats() if stats is None else stats, table)
+    current_node.value = value
+    current_node.set_favorite_path([bits_to_board(*position) for position in line])
+    return value
+    
+
+#minimax algorithm with alpha beta pruning from a node, searched on its bitboards by bit_alpha_beta. table, stats and
+#the favorite path are as in minimax. root_bound is the shared bound of a parallel root split (see parallel_alpha_beta), read
+#before each child of this node is searched. stats, when given, counts the nodes searched and the beta cutoffs
+def alpha_beta_minimax(current_node: Node, max_is_first=True, alpha = -100000000, beta = 100000000,
+                       table: TranspositionTable = None, root_bound=None, stats: SearchStats = None) -> int:
+    p1, p2 = board_to_bits(current_node.board)
+    value, line = bit_alpha_beta(p1, p2, current_node.maxing, current_node.depth, current_node.path,
+                                 SearchStats() if stats is None else stats, max_is_first, alpha, beta, table,
+                                 root_bound)
+    current_node.value = value
+    current_node.set_favorite_path([bits_to_board(*position) for position in line])
+    return value
+
+
+# Bitboards. A position is two 9 bit masks, one per player, with bit row * 3 + col set where that player has a
+# piece. Everything the search asks of a position is read from tables over all 512 masks built once at import.
+
+FULL_MASK = (1 << 9) - 1
+
+# mask of the points a piece on point i can move to
+ADJACENT = [sum(1 << ((row + d_row) * 3 + col + d_col) for d_row, d_col in MOVE_DELTAS[(row, col)])
+            for row, col in itertools.product(range(3), range(3))]
+
+WIN_MASKS = [sum(1 << (row * 3 + col) for row, col in line) for line in WIN_LINES]
+
+# per mask: whether it covers a win line, how many win lines it leaves untouched, its points and its piece count
+IS_WIN = [any(mask & line == line for line in WIN_MASKS) for mask in range(FULL_MASK + 1)]
+OPEN_LINES = [sum(1 for line in WIN_MASKS if not mask & line) for mask in range(FULL_MASK + 1)]
+MASK_POINTS = [[i for i in range(9) if mask >> i & 1] for mask in range(FULL_MASK + 1)]
+PIECE_COUNT = [len(points) for points in MASK_POINTS]
+
+# per mask: the base 3 number of its points with each point worth 1, and the xor of the Zobrist keys of its points
+# for each player
+TERNARY = [sum(3 ** point for point in MASK_POINTS[mask]) for mask in range(FULL_MASK + 1)]
+ZOBRIST_MASKS = [[0] * (FULL_MASK + 1)] + [
+    [functools.reduce(operator.xor, (ZOBRIST[point][player] for point in MASK_POINTS[mask]), 0)
+     for mask in range(FULL_MASK + 1)] for player in [PLAYER_1, PLAYER_2]]
+
+# per symmetry in SYMMETRIES: the mask every mask is turned into
+SYMMETRY_MASKS = [[sum(1 << i for i, (row, col) in enumerate(symmetry) if mask >> (row * 3 + col) & 1)
+                   for mask in range(FULL_MASK + 1)] for symmetry in SYMMETRIES]
+
+# the two masks of a list board
+def board_to_bits(board: List[List[int]]) -> Tuple[int, int]:
+    p1 = p2 = 0
+    for row, col in itertools.product(range(3), range(3)):
+        if board[row][col] == PLAYER_1:
+            p1 |= 1 << (row * 3 + col)
+        elif board[row][col] == PLAYER_2:
+            p2 |= 1 << (row * 3 + col)
+    return p1, p2
+
+# the list board of two masks
+def bits_to_board(p1: int, p2: int) -> List[List[int]]:
+    return [[PLAYER_1 if p1 >> (row * 3 + col) & 1 else PLAYER_2 if p2 >> (row * 3 + col) & 1 else BLANK
+             for col in range(3)] for row in range(3)]
+
+# every mask the mover's pieces can be in after one move, other is the opponent's mask. With fewer than three
+# pieces a piece is placed on any empty point, otherwise one piece steps to an empty adjacent point.
+def bit_moves(mover: int, other: int) -> List[int]:
+    empty = FULL_MASK & ~(mover | other)
+    if PIECE_COUNT[mover] < 3:
+        return [mover | 1 << point for point in MASK_POINTS[empty]]
+    return [mover & ~(1 << start) | 1 << end
+            for start in MASK_POINTS[mover] for end in MASK_POINTS[ADJACENT[start] & empty]]
+
+# the Zobrist hash of a position and whose turn it is, the same as zobrist_hash of its board
+def bit_hash(p1: int, p2: int, maxing: bool) -> int:
+    return ZOBRIST_MASKS[PLAYER_1][p1] ^ ZOBRIST_MASKS[PLAYER_2][p2] ^ (ZOBRIST_MAXING if maxing else 0)
+
+# the same rating as rate_board
+def bit_rate(p1: int, p2: int) -> int:
+    if IS_WIN[p1]:
         return 8
-    if res == PLAYER_2:
+    if IS_WIN[p2]:
         return -8
     return 0
 
-nodes = []
-
-#minimax algorithm
-def minimax(current_node: Node) -> int:
-    board = current_node.board
-    player = 1 if current_node.maxing else 2
-    neighbors = make_neighbors(board, player)
-
-    if check_wins(board) is not None or current_node.depth == MAX_DEPTH :
-        return rate_board(board)
-
-    if current_node.maxing:
-        best = -1000000
-        value = -best
-        for neighbor in neighbors:
-            if current_node.is_ancestor(neighbor, not current_node.maxing):
-                continue
-                #possibly continue
-            else:
-                neighbor_node = current_node.make_child_with_board(neighbor)
-                value = minimax(neighbor_node)
-                if value >= best:
-                    best = value
-                    current_node.favorite_child = neighbor_node
-
-        return best
-            
-    else:
-        best = 1000000
-        value = -best
-        for neighbor in neighbors:
-            if current_node.is_ancestor(neighbor, not current_node.maxing):
-                continue
-                #possibly continue
-            else:
-                neighbor_node = current_node.make_child_with_board(neighbor)
-                value = minimax(neighbor_node)
-                if value <= best:
-                    best = value
-                    current_node.favorite_child = neighbor_node
-        return best
-    
-
-#minimax algorithm with alpha beta pruning
-def alpha_beta_minimax(current_node: Node, max_is_first=True, alpha = -100000000, beta = 100000000) -> int:
-    board = current_node.board
-    if max_is_first:
-        player = 1 if current_node.maxing else 2
-    else:
-        player = 2 if current_node.maxing else 1
-
-
-    if check_wins(board) is not None or current_node.depth == MAX_DEPTH:
-        value = rate_board(board)
-        return value
-
-    if current_node.maxing:
-        best = -1000000
-        nodevalue = best
-        neighbors = make_neighbors(board, player)
-        neighbors.sort(key= compute_diff_possible_wins, reverse=True)
-        for neighbor in neighbors:
-            if current_node.is_ancestor(neighbor, not current_node.maxing):
-                continue
-                #possibly continue
-            else:
-                neighbor_node = current_node.make_child_with_board(neighbor)
-                ab = alpha_beta_minimax(neighbor_node, max_is_first=max_is_first, alpha = alpha, beta = beta, )
-                nodevalue = max(nodevalue, ab)
-                alpha = max(alpha, nodevalue)
-                if ab >= best:
-                    best = ab
-                    current_node.favorite_child = neighbor_node
-                    current_node.value = nodevalue
-                if beta <= alpha:
-                    break
-
-        return best
-            
+# the positions a bitboard search passes through, root first
+def bit_path(p1: int, p2: int, line: List[Tuple[int, int]]) -> List[List[List[int]]]:
+    return [bits_to_board(p1, p2)] + [bits_to_board(*position) for position in line]
+
+# minimax over bitboards: player 1 maxes, search stops at a win or MAX_DEPTH and a move back into a position already
+# on the path scores a draw. path holds the bit_hash of every position the search is inside. table is an optional
+# TranspositionTable. return the value and the line of (p1, p2) positions the favorite children lead through
+def bit_minimax(p1: int, p2: int, maxing: bool, depth: int, path: set, stats: SearchStats,
+                table: TranspositionTable = None) -> Tuple[int, List[Tuple[int, int]]]:
+    stats.nodes += 1
+    hash = bit_hash(p1, p2, maxing)
+    if IS_WIN[p1] or IS_WIN[p2] or depth == MAX_DEPTH or hash in path:
+        return bit_rate(p1, p2), []
+
+    player = PLAYER_1 if maxing else PLAYER_2
+    if table is not None:
+        key = table.bit_key(p1, p2, player, maxing)
+        value = table.cutoff_value(table.lookup(key), MAX_DEPTH - depth, -1000000, 1000000)
+        if value is not None:
+            return value, []
+
+    path.add(hash)
+    best = -1000000 if maxing else 1000000
+    best_line = []
+    children = [(move, p2) for move in bit_moves(p1, p2)] if maxing else [(p1, move) for move in bit_moves(p2, p1)]
+    for child in children:
+        value, line = bit_minimax(child[0], child[1], not maxing, depth + 1, path, stats, table)
+        if (maxing and value > best) or (not maxing and value < best):
+            best = value
+            best_line = [child] + line
+    path.discard(hash)
+
+    if table is not None and best_line:
+        best_key = table.bit_key(best_line[0][0], best_line[0][1], 3 - player, not maxing)
+        table.store(key, best, MAX_DEPTH - depth, table.EXACT, best_key)
+    return best, best_line
+
+# bit_minimax with alpha beta pruning. Moves are tried by the difference in open win lines they leave, after the
+# best child a table entry holds for the position. root_bound is as in alpha_beta_minimax. The favorite only changes
+# on a strict improvement, a later child that only ties the best value may have failed low and be worth less than it
+# scored
+def bit_alpha_beta(p1: int, p2: int, maxing: bool, depth: int, path: set, stats: SearchStats,
+                   max_is_first: bool = True, alpha: int = -100000000, beta: int = 100000000,
+                   table: TranspositionTable = None, root_bound=None) -> Tuple[int, List[Tuple[int, int]]]:
+    stats.nodes += 1
+    hash = bit_hash(p1, p2, maxing)
+    if IS_WIN[p1] or IS_WIN[p2] or depth == MAX_DEPTH or hash in path:
+        return bit_rate(p1, p2), []
+
+    player = player_to_move(maxing, max_is_first)
+    entry = None
+    if table is not None:
+        key = table.bit_key(p1, p2, player, maxing)
+        entry = table.lookup(key)
+        value = table.cutoff_value(entry, MAX_DEPTH - depth, alpha, beta)
+        if value is not None:
+            return value, []
+        alpha_start, beta_start = alpha, beta
+
+    if player == PLAYER_1:
+        children = [(move, p2) for move in bit_moves(p1, p2)]
     else:
-        best = 1000000
-        value = 1000000
-        ab = best
-        neighbors = make_neighbors(board, player)
-        neighbors.sort(key= compute_diff_possible_wins, reverse=True)
-        for neighbor in neighbors:
-            if current_node.is_ancestor(neighbor, not current_node.maxing):
-                continue
-                #possibly continue
+        children = [(p1, move) for move in bit_moves(p2, p1)]
+    children.sort(key=lambda child: OPEN_LINES[child[1]] - OPEN_LINES[child[0]], reverse=True)
+    if entry is not None:
+        table.best_first(children, entry, 3 - player, not maxing)
+
+    path.add(hash)
+    best = -1000000 if maxing else 1000000
+    best_line = []
+    for child in children:
+        if root_bound is not None:
+            if maxing:
+                beta = min(beta, root_bound.value)
             else:
-                neighbor_node = current_node.make_child_with_board(neighbor)
-                ab = alpha_beta_minimax(neighbor_node,max_is_first=max_is_first, alpha = alpha, beta = beta, )
-                value = min(value, ab)
-                beta = min(beta, value)
-                if ab <= best:
-                    best = ab
-                    current_node.favorite_child = neighbor_node
-                    current_node.value = value
-                if beta <= alpha:
+                alpha = max(alpha, root_bound.value)
+            if beta <= alpha:
+                break
+        value, line = bit_alpha_beta(child[0], child[1], not maxing, depth + 1, path, stats, max_is_first,
+                                     alpha, beta, table)
+        if maxing:
+            if value > best:
+                best = value
+                best_line = [child] + line
+            alpha = max(alpha, value)
+        else:
+            if value < best:
+                best = value
+                best_line = [child] + line
+            beta = min(beta, value)
+        if beta <= alpha:
+            stats.cutoffs += 1
+            break
+    path.discard(hash)
+
+    if table is not None and best_line:
+        if best <= alpha_start:
+            bound = table.UPPER
+        elif best >= beta_start:
+            bound = table.LOWER
+        else:
+            bound = table.EXACT
+        best_key = table.bit_key(best_line[0][0], best_line[0][1], 3 - player, not maxing)
+        table.store(key, best, MAX_DEPTH - depth, bound, best_key)
+    return best, best_line
+
+# scores of the timed search are from the side of the player to move, a win found ply plies down scores
+# WIN_SCORE - ply so the fastest win is preferred
+WIN_SCORE = 1000
+
+# raised inside a timed search once its time budget is spent
+class SearchTimeout(Exception):
+    pass
+
+# Iterative deepening alpha beta over bitboards for playing moves under a time limit.
+# Each iteration searches one ply deeper than the last. Moves are tried in the order: the best child the previous
+# iterations found for the position, the killer moves that last caused a cutoff at the same ply, moves by their
+# history score (cutoffs caused, weighted by depth squared) and last by the difference in open win lines.
+# The history is kept between searches, so an engine reused over a game keeps learning which moves cut.
+# When the budget runs out part way through an iteration the last finished iteration's line is played.
+class IterativeDeepeningSearch:
+
+    def __init__(self, max_depth: int = MAX_DEPTH):
+        self.max_depth = max_depth
+        self.history = {}
+        self.best_children = {}
+        self.killers = []
+        self.stats = SearchStats()
+        self.deadline = None
+        self.depth_reached = 0
+
+    # the children of a position as ((p1, p2), move), the move being the mask of the points the mover changed
+    @staticmethod
+    def children(p1: int, p2: int, player: int) -> List[Tuple[Tuple[int, int], int]]:
+        if player == PLAYER_1:
+            return [((move, p2), p1 ^ move) for move in bit_moves(p1, p2)]
+        return [((p1, move), p2 ^ move) for move in bit_moves(p2, p1)]
+
+    # sort children best first for the player to move at ply
+    def order(self, children: List[Tuple[Tuple[int, int], int]], p1: int, p2: int, player: int, ply: int) -> None:
+        best_child = self.best_children.get((p1, p2, player))
+        killers = self.killers[ply]
+        sign = 1 if player == PLAYER_1 else -1
+        children.sort(key=lambda item: (item[0] == best_child, item[1] in killers,
+                                        self.history.get((player, item[1]), 0),
+                                        sign * (OPEN_LINES[item[0][1]] - OPEN_LINES[item[0][0]])), reverse=True)
+
+    # negamax alpha beta depth plies below a position, return the score for the player to move and the best line.
+    # As in alpha_beta_minimax a position already on the path is a draw and a position with no move is lost
+    def search_position(self, p1: int, p2: int, player: int, depth: int, ply: int, alpha: int, beta: int,
+                        path: set) -> Tuple[int, List[Tuple[int, int]]]:
+        self.stats.nodes += 1
+        if self.deadline is not None and self.stats.nodes % 1024 == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+        if IS_WIN[p2 if player == PLAYER_1 else p1]:
+            return ply - WIN_SCORE, []
+        if depth == 0 or (p1, p2, player) in path:
+            return 0, []
+
+        opponent = PLAYER_2 if player == PLAYER_1 else PLAYER_1
+        children = self.children(p1, p2, player)
+        self.order(children, p1, p2, player, ply)
+
+        best = ply - WIN_SCORE
+        best_line = []
+        best_child = None
+        path.add((p1, p2, player))
+        try:
+            for child, move in children:
+                value, line = self.search_position(child[0], child[1], opponent, depth - 1, ply + 1, -beta, -alpha,
+                                                   path)
+                value = -value
+                if value > best:
+                    best, best_line, best_child = value, [child] + line, child
+                alpha = max(alpha, value)
+                if alpha >= beta:
+                    self.stats.cutoffs += 1
+                    if move not in self.killers[ply]:
+                        self.killers[ply] = [move, self.killers[ply][0]]
+                    self.history[(player, move)] = self.history.get((player, move), 0) + depth * depth
                     break
-        return best
-
-
+        finally:
+            path.discard((p1, p2, player))
+
+        if best_child is not None:
+            self.best_children[(p1, p2, player)] = best_child
+        return best, best_line
+
+    # Search board with player to move, deepening until budget seconds have passed (no limit when None), max_depth
+    # is reached or a forced result is found. return the value on rate_board's scale, 8 for a forced player 1 win,
+    # -8 for player 2 and 0 otherwise, and the best line of boards, whose first board is the move to play
+    def search(self, board: List[List[int]], player: int,
+               budget: float = None) -> Tuple[int, List[List[List[int]]]]:
+        p1, p2 = board_to_bits(board)
+        self.stats = SearchStats()
+        self.killers = [[None, None] for _ in range(self.max_depth + 1)]
+        self.depth_reached = 0
+        tic = time.perf_counter()
+        self.deadline = None if budget is None else tic + budget
+
+        value, best_line = 0, []
+        for depth in range(1, self.max_depth + 1):
+            try:
+                value, best_line = self.search_position(p1, p2, player, depth, 0, -WIN_SCORE, WIN_SCORE, set())
+            except SearchTimeout:
+                break
+            self.depth_reached = depth
+            if abs(value) > WIN_SCORE - self.max_depth - 1:
+                break
+        self.stats.seconds = time.perf_counter() - tic
+
+        # out of time before the first iteration finished, play the first legal move
+        if not best_line and not IS_WIN[p1] and not IS_WIN[p2]:
+            children = self.children(p1, p2, player)
+            best_line = [children[0][0]] if children else []
+
+        if abs(value) <= WIN_SCORE - self.max_depth - 1:
+            rating = 0
+        else:
+            rating = 8 if (value > 0) == (player == PLAYER_1) else -8
+        return rating, [bits_to_board(*position) for position in best_line]
 
 
     
-def minimax_analysis(p1start):
+def minimax_analysis(p1start, table: TranspositionTable = None):
 
     board = make_board()
     node = Node(board, maxing=p1start)
-    minimax(node)
+    minimax(node, table)
+    if table is not None:
+        table.extend_path(node)
     return [n.board for n in node.get_favorite_path()]
 
-def ab_analysis(p1start):
+def ab_analysis(p1start, table: TranspositionTable = None):
 
     board = make_board()
     node = Node(board)
-    print(alpha_beta_minimax(node, max_is_first=p1start))
+    print(alpha_beta_minimax(node, max_is_first=p1start, table=table))
+    if table is not None:
+        table.extend_path(node, max_is_first=p1start)
         
     return [n.board for n in node.get_favorite_path()]
 
+# Parallel root split. The root's children are searched as separate alpha_beta_minimax calls, each handing back
+# only its principal variation. Young brothers wait: the eldest child, first in move order, is searched before the rest so they start with a
+# real bound. The rest go to a process pool and share the root's best value so far through a multiprocessing.Value.
+# A worker raises it (or lowers it for a minimizing root) as soon as its child is scored, and every running child
+# search reads it again before each of its own moves, so a bound found by one worker narrows the others mid search.
+
+# the root bound shared with the pool workers, handed over by the pool initializer
+shared_root_bound = None
+
+# pool initializer, keep the shared root bound in the worker process
+def set_shared_root_bound(bound) -> None:
+    global shared_root_bound
+    shared_root_bound = bound
+
+# search one root child, job is (child index, child board, root board, root maxing, root depth, root path,
+# max_is_first). The root is rebuilt at its own depth with its ancestors on the path.
+# return the index, the child's value, the line of boards from the child down and whether the value is exact. A
+# value that does not beat the shared bound when the search ends may have failed low against it
+def parallel_root_worker(job: Tuple[int, List[List[int]], List[List[int]], bool, int, set, bool]
+                         ) -> Tuple[int, int, list, bool]:
+    index, board, root_board, root_maxing, root_depth, root_path, max_is_first = job
+    root = Node(root_board, maxing=root_maxing, depth=root_depth, path=set(root_path))
+    root.push()
+    child = root.make_child_with_board(board, keep=False)
+
+    bound = shared_root_bound.value
+    if root_maxing:
+        value = alpha_beta_minimax(child, max_is_first=max_is_first, alpha=bound, root_bound=shared_root_bound)
+        with shared_root_bound.get_lock():
+            exact = value > shared_root_bound.value
+            shared_root_bound.value = max(shared_root_bound.value, value)
+    else:
+        value = alpha_beta_minimax(child, max_is_first=max_is_first, beta=bound, root_bound=shared_root_bound)
+        with shared_root_bound.get_lock():
+            exact = value < shared_root_bound.value
+            shared_root_bound.value = min(shared_root_bound.value, value)
+    return index, value, [path_node.board for path_node in child.get_favorite_path()], exact
+
+# alpha_beta_minimax with the root's children split over processes. The exact results are merged in move order with
+# the same tie rule as the serial search and the winner's line becomes the root's favorite path. The child that last
+# moved the shared bound was exact, so the best value is always among them. return the value
+def parallel_alpha_beta(root: Node, max_is_first=True, processes: int = None) -> int:
+    player = player_to_move(root.maxing, max_is_first)
+    if check_wins(root.board) is not None or root.depth == MAX_DEPTH:
+        return alpha_beta_minimax(root, max_is_first=max_is_first)
+    neighbors = make_neighbors(root.board, player)
+    neighbors.sort(key= compute_diff_possible_wins, reverse=True)
+    if not neighbors:
+        return alpha_beta_minimax(root, max_is_first=max_is_first)
+
+    bound = multiprocessing.Value('i', -100000000 if root.maxing else 100000000)
+    jobs = [(index, neighbor, root.board, root.maxing, root.depth, set(root.path), max_is_first)
+            for index, neighbor in enumerate(neighbors)]
+    set_shared_root_bound(bound)
+    results = [parallel_root_worker(jobs[0])]
+    with multiprocessing.Pool(processes, initializer=set_shared_root_bound, initargs=(bound,)) as pool:
+        results.extend(pool.imap_unordered(parallel_root_worker, jobs[1:]))
+
+    best = -1000000 if root.maxing else 1000000
+    best_line = []
+    for index, value, line, exact in sorted(results, key=lambda result: result[0]):
+        if exact and ((root.maxing and value > best) or (not root.maxing and value < best)):
+            best, best_line = value, line
+    root.value = best
+    root.set_favorite_path(best_line)
+    return best
+
+# ab_analysis with the root split over processes
+def parallel_ab_analysis(p1start, processes: int = None):
+
+    board = make_board()
+    node = Node(board)
+    print(parallel_alpha_beta(node, max_is_first=p1start, processes=processes))
+
+    return [n.board for n in node.get_favorite_path()]
+
+# whether parallel_alpha_beta and alpha_beta_minimax give the same value for board from a root at depth
+def parallel_matches_serial(board: List[List[int]], maxing: bool = True, depth: int = 0, max_is_first: bool = True,
+                            processes: int = None) -> bool:
+    serial = alpha_beta_minimax(Node(board, maxing=maxing, depth=depth), max_is_first=max_is_first)
+    parallel = parallel_alpha_beta(Node(board, maxing=maxing, depth=depth), max_is_first, processes)
+    return serial == parallel
+
+# time ab_analysis against parallel_ab_analysis on run_algos' two openings, return the times and speedups. Also
+# checks the two agree on a midgame position searched from roots below the top of the tree
+def parallel_speedup(processes: int = None) -> dict:
+    report = {"processes": processes or multiprocessing.cpu_count(), "runs": [], "checks": []}
+    board = [[PLAYER_1, PLAYER_1, PLAYER_2], [BLANK, PLAYER_2, PLAYER_2], [BLANK, BLANK, PLAYER_1]]
+    for depth in [MAX_DEPTH - 1, MAX_DEPTH - 4, MAX_DEPTH - 8]:
+        same = parallel_matches_serial(board, depth=depth, processes=processes)
+        report["checks"].append({"depth": depth, "same_value": same})
+        print(f"Root depth {depth}: parallel value {'matches' if same else 'DIFFERS FROM'} serial")
+    for p1start in [False, True]:
+        tic = time.perf_counter()
+        serial = ab_analysis(p1start)
+        serial_seconds = time.perf_counter() - tic
+        tic = time.perf_counter()
+        parallel = parallel_ab_analysis(p1start, processes)
+        parallel_seconds = time.perf_counter() - tic
+        report["runs"].append({"p1start": p1start, "serial_seconds": serial_seconds,
+                               "parallel_seconds": parallel_seconds, "speedup": serial_seconds / parallel_seconds,
+                               "same_path": serial == parallel})
+        print(f"Player {'1' if p1start else '2'} First: serial {serial_seconds:0.4f}s, "
+              f"parallel {parallel_seconds:0.4f}s, speedup {serial_seconds / parallel_seconds:0.2f}")
+    return report
+
+# minimax_analysis on bitboards
+def bit_minimax_analysis(p1start):
+    stats = SearchStats()
+    tic = time.perf_counter()
+    value, line = bit_minimax(0, 0, p1start, 0, set(), stats)
+    stats.seconds = time.perf_counter() - tic
+    print(value, stats)
+    return bit_path(0, 0, line)
+
+# ab_analysis on bitboards
+def bit_ab_analysis(p1start):
+    stats = SearchStats()
+    tic = time.perf_counter()
+    value, line = bit_alpha_beta(0, 0, True, 0, set(), stats, max_is_first=p1start)
+    stats.seconds = time.perf_counter() - tic
+    print(value, stats)
+    return bit_path(0, 0, line)
+
+# the opening move of an iterative deepening search given budget seconds, with its line and search statistics
+def id_ab_analysis(p1start, budget: float = 5.0):
+    engine = IterativeDeepeningSearch()
+    board = make_board()
+    rating, line = engine.search(board, PLAYER_1 if p1start else PLAYER_2, budget)
+    print(rating, f"depth {engine.depth_reached}", engine.stats)
+    return [board] + line
+
+# ab_analysis with a fresh transposition table, printing how often it was hit
+def ab_table_analysis(p1start):
+    table = TranspositionTable()
+    path = ab_analysis(p1start, table)
+    print(table)
+    return path
+
 def time_n_print_solve(label: str, func, args = []):
     tic = time.perf_counter()
     solution = vertical_path_to_horizontal(func(*args))
@@ -338,7 +831,8 @@ def time_n_print_solve(label: str, func, args = []):
 
 def run_algos():
 
-    algs = {"ABMinimax": ab_analysis}
+    algs = {"ABMinimax": ab_analysis, "ABMinimaxTT": ab_table_analysis,
+            "BitABMinimax": bit_ab_analysis, "IDABMinimax": id_ab_analysis, "ParallelABMinimax": parallel_ab_analysis}
 
     times = {label: [] for label in algs.keys()}
     results = {label: [] for label in algs.keys()}
@@ -362,4 +856,5 @@ def run_algos():
             print(f"{label} -> {str(avg_time)}")
             out_file.write(f"{label} -> {str(avg_time)}\n")
 
-run_algos()
\ No newline at end of file
+if __name__ == '__main__':
+    run_algos()
\ No newline at end of file
@@ -0,0 +1,206 @@
+from typing import List, Tuple, Dict
+from collections import deque
+import mmap, os, struct, time
+
+from ThreeMensMorrisSolver import PLAYER_1, PLAYER_2, MAX_DEPTH, FULL_MASK, IS_WIN, PIECE_COUNT, TERNARY, \
+    bit_moves, board_to_bits, bits_to_board, time_n_print_solve
+
+# Retrograde solve of Three Men's Morris.
+# Every legal position, up to three pieces a side on the 9 points with either player to move, is labelled with its
+# game theoretic value under perfect play. Solving starts from the finished positions, where the player to move has
+# lost to a line or has no move, and works backwards: a position is a win if some move reaches a loss for the
+# opponent and a loss once every move reaches a win for the opponent. Whatever is never labelled can be kept from
+# ending by both sides and is a draw.
+# A position is stored at index (base 3 code of the board) * 2 + player to move - 1, one byte each. 0 is a draw,
+# INVALID a position that can not come up, anything else is 1 + the number of plies to the end of the game with
+# the winner playing fastest and the loser slowest. An odd number of plies is a win for the player to move.
+
+DRAW = 0
+INVALID = 255
+MAGIC = b'TMMD'
+HEADER = struct.Struct('<4sI')
+TABLE_SIZE = 3 ** 9 * 2
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'endgame_databases', 'three_mens_morris.tmdb')
+
+# table index of a position
+def position_index(p1: int, p2: int, player: int) -> int:
+    return (TERNARY[p1] + 2 * TERNARY[p2]) * 2 + player - 1
+
+
+# every position after one move by player, with the opponent to move. none once either side has a line
+def successors(p1: int, p2: int, player: int) -> List[Tuple[int, int, int]]:
+    if IS_WIN[p1] or IS_WIN[p2]:
+        return []
+    if player == PLAYER_1:
+        return [(move, p2, PLAYER_2) for move in bit_moves(p1, p2)]
+    return [(p1, move, PLAYER_1) for move in bit_moves(p2, p1)]
+
+
+# label every position, return the table
+def solve() -> bytearray:
+    table = bytearray([INVALID]) * TABLE_SIZE
+    remaining = {}
+    predecessors = {}
+    front = deque()
+
+    for p1 in range(FULL_MASK + 1):
+        if PIECE_COUNT[p1] > 3:
+            continue
+        for p2 in range(FULL_MASK + 1):
+            if p1 & p2 or PIECE_COUNT[p2] > 3:
+                continue
+            for player in [PLAYER_1, PLAYER_2]:
+                mover, other = (p1, p2) if player == PLAYER_1 else (p2, p1)
+                index = position_index(p1, p2, player)
+                # the player to move already having a line can not come up, the game ended on the move before
+                if IS_WIN[mover]:
+                    continue
+
+                table[index] = DRAW
+                children = successors(p1, p2, player)
+                if IS_WIN[other] or not children:
+                    table[index] = 1
+                    front.append(index)
+                    continue
+
+                remaining[index] = len(children)
+                for child in children:
+                    predecessors.setdefault(position_index(*child), []).append(index)
+
+    # breadth first by distance, so a win is labelled with its shortest distance and a loss with its longest
+    while front:
+        index = front.popleft()
+        plies = table[index] - 1
+        lost = plies % 2 == 0
+        for parent in predecessors.get(index, []):
+            if parent not in remaining:
+                continue
+            if lost:
+                table[parent] = plies + 2
+                del remaining[parent]
+                front.append(parent)
+            else:
+                remaining[parent] -= 1
+                if remaining[parent] == 0:
+                    table[parent] = plies + 2
+                    del remaining[parent]
+                    front.append(parent)
+
+    return table
+
+
+# The solved table, either freshly built in memory or memory mapped from disk
+class EndgameDatabase:
+
+    def __init__(self, table):
+        self.table = table
+        self._mapped = None
+
+    # solve every position from scratch
+    @classmethod
+    def build(cls) -> 'EndgameDatabase':
+        return cls(solve())
+
+    # write the header and the table bytes to path
+    def save(self, path: str = DEFAULT_PATH) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as out_file:
+            out_file.write(HEADER.pack(MAGIC, len(self.table)))
+            out_file.write(self.table)
+
+    # memory map a table written by save
+    @classmethod
+    def load(cls, path: str = DEFAULT_PATH) -> 'EndgameDatabase':
+        with open(path, 'rb') as in_file:
+            mapped = mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, size = HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC or size != TABLE_SIZE:
+            raise Exception(f"Not a Three Men's Morris endgame database. {path}")
+
+        database = cls(memoryview(mapped)[HEADER.size:HEADER.size + size])
+        database._mapped = mapped
+        return database
+
+    # load the table at path, solving and saving it first if it is missing
+    @classmethod
+    def load_or_build(cls, path: str = DEFAULT_PATH) -> 'EndgameDatabase':
+        if not os.path.exists(path):
+            cls.build().save(path)
+        return cls.load(path)
+
+    # the outcome for the player to move, 1 win, 0 draw or -1 loss, and the plies until the game ends
+    def result(self, board: List[List[int]], player: int) -> Tuple[int, int]:
+        entry = self.table[position_index(*board_to_bits(board), player)]
+        if entry == INVALID:
+            raise Exception("Position can not come up in a game.")
+        if entry == DRAW:
+            return 0, None
+        plies = entry - 1
+        return (1 if plies % 2 else -1), plies
+
+    # the perfect play value on rate_board's scale, 8 when player 1 wins, -8 when player 2 wins, 0 for a draw
+    def rate(self, board: List[List[int]], player: int) -> int:
+        outcome, _ = self.result(board, player)
+        return outcome * (8 if player == PLAYER_1 else -8)
+
+    # the best move for player as the board after it. A win is taken by its fastest line, a loss dragged out as
+    # long as possible and a draw kept a draw. None when the game is over
+    def best_move(self, board: List[List[int]], player: int) -> List[List[int]]:
+        p1, p2 = board_to_bits(board)
+        best = None
+        best_rank = None
+        for child in successors(p1, p2, player):
+            outcome, plies = self.result(bits_to_board(child[0], child[1]), child[2])
+            # rank children for the player moving, an opponent loss beats a draw beats an opponent win
+            rank = (-outcome, -plies if outcome < 0 else plies if outcome > 0 else 0)
+            if best_rank is None or rank > best_rank:
+                best, best_rank = child, rank
+        return None if best is None else bits_to_board(best[0], best[1])
+
+    # a perfect game from board with player to move, stopping when it ends or after MAX_DEPTH plies of a draw
+    def principal_path(self, board: List[List[int]], player: int) -> List[List[List[int]]]:
+        path = [board]
+        while len(path) <= MAX_DEPTH:
+            board = self.best_move(board, player)
+            if board is None:
+                break
+            path.append(board)
+            player = PLAYER_2 if player == PLAYER_1 else PLAYER_1
+        return path
+
+    # how many positions have each label, keyed "win", "loss" and "draw" for the player to move, and the longest win
+    def summary(self) -> Dict[str, int]:
+        counts = {"win": 0, "loss": 0, "draw": 0, "longest": 0}
+        for entry in self.table:
+            if entry == INVALID:
+                continue
+            if entry == DRAW:
+                counts["draw"] += 1
+            else:
+                counts["win" if (entry - 1) % 2 else "loss"] += 1
+                counts["longest"] = max(counts["longest"], entry - 1)
+        return counts
+
+
+# the same answer as ab_analysis straight from the database: print the perfect play value from an empty board and
+# return a perfect game
+def database_analysis(p1start, database: EndgameDatabase = None):
+    if database is None:
+        database = EndgameDatabase.load_or_build()
+    board = bits_to_board(0, 0)
+    player = PLAYER_1 if p1start else PLAYER_2
+    print(database.rate(board, player))
+    return database.principal_path(board, player)
+
+
+if __name__ == '__main__':
+    tic = time.perf_counter()
+    database = EndgameDatabase.load_or_build()
+    toc = time.perf_counter()
+    print(f"Endgame database ready in {toc - tic:0.4f} seconds, {database.summary()}")
+
+    for p1start in [True, False]:
+        seconds, result = time_n_print_solve("Database Player " + ("1" if p1start else "2") + " First",
+                                             database_analysis, [p1start, database])
+        print(result)
@@ -0,0 +1,313 @@
+from typing import List, Tuple, Dict
+import json, math, random, subprocess, sys, time
+
+from ThreeMensMorrisSolver import PLAYER_1, PLAYER_2, MAX_DEPTH, Node, TranspositionTable, SearchStats, \
+    IterativeDeepeningSearch, make_board, make_neighbors, check_wins, minimax, alpha_beta_minimax, bit_alpha_beta, \
+    board_to_bits, bits_to_board
+from endgameDatabase import EndgameDatabase
+
+# Self play arena and throughput benchmark for the Three Men's Morris engines.
+# Every engine plays every other from both sides over seeded games. Each game opens with a few random moves picked
+# from the seed so the games differ, then the engines take turns until a line is made, the side to move is stuck or
+# max_plies pass. Per engine the nodes searched, cutoffs, transposition hits and move latencies are kept, and the
+# depth limited engines are checked on the positions they met: they must give the same value, and the move each one
+# picks must score that value when minimax searches it. The transposition table engine is checked with its table
+# held to entries of the exact depth, and the values its deeper entries change are counted apart. Results are written as json so runs from different commits
+# can be diffed.
+
+# An engine takes (board, player to move, depth, budget seconds) and returns the board after its move (None when it
+# has no move), the value it found on rate_board's scale and its counters. Node tree engines search depth plies by
+# starting their root at depth MAX_DEPTH - depth.
+
+DEFAULT_ENGINES = ["minimax", "alphabeta", "alphabeta-tt", "bitboard", "iterative-deepening", "database"]
+
+# engines searching exactly depth plies under the same rules, which must agree on every value, by the engine each is
+# checked through. alphabeta-tt reuses table entries searched deeper than needed, so it is checked with a table
+# limited to entries of the exact depth, and the values its own table changes are reported apart
+SAME_VALUE_ENGINES = {"minimax": "minimax", "alphabeta": "alphabeta", "alphabeta-tt": "alphabeta-tt-exact",
+                      "bitboard": "bitboard"}
+
+
+# the favorite child's board of a searched root, None when it found no move
+def favorite_board(root: Node) -> List[List[int]]:
+    return None if root.favorite_child is None else root.favorite_child.board
+
+
+def minimax_engine(board: List[List[int]], player: int, depth: int, budget: float) -> Tuple[list, int, Dict]:
+    root = Node(board, maxing=player == PLAYER_1, depth=MAX_DEPTH - depth)
+    stats = SearchStats()
+    value = minimax(root, stats=stats)
+    return favorite_board(root), value, {"nodes": stats.nodes, "cutoffs": 0}
+
+
+def alpha_beta_engine(board: List[List[int]], player: int, depth: int, budget: float) -> Tuple[list, int, Dict]:
+    root = Node(board, maxing=player == PLAYER_1, depth=MAX_DEPTH - depth)
+    stats = SearchStats()
+    value = alpha_beta_minimax(root, stats=stats)
+    return favorite_board(root), value, {"nodes": stats.nodes, "cutoffs": stats.cutoffs}
+
+
+def alpha_beta_table_engine(board: List[List[int]], player: int, depth: int, budget: float,
+                            exact_depth: bool = False) -> Tuple[list, int, Dict]:
+    root = Node(board, maxing=player == PLAYER_1, depth=MAX_DEPTH - depth)
+    table = TranspositionTable(exact_depth)
+    stats = SearchStats()
+    value = alpha_beta_minimax(root, table=table, stats=stats)
+    return favorite_board(root), value, {"nodes": stats.nodes, "cutoffs": stats.cutoffs, "tt_probes": table.probes,
+                                         "tt_hits": table.hits, "tt_cutoffs": table.cutoffs}
+
+
+# alpha_beta_table_engine with its table only using entries searched exactly as deep as needed
+def alpha_beta_exact_table_engine(board: List[List[int]], player: int, depth: int,
+                                  budget: float) -> Tuple[list, int, Dict]:
+    return alpha_beta_table_engine(board, player, depth, budget, exact_depth=True)
+
+
+def bitboard_engine(board: List[List[int]], player: int, depth: int, budget: float) -> Tuple[list, int, Dict]:
+    p1, p2 = board_to_bits(board)
+    stats = SearchStats()
+    value, line = bit_alpha_beta(p1, p2, player == PLAYER_1, MAX_DEPTH - depth, set(), stats)
+    return (bits_to_board(*line[0]) if line else None), value, {"nodes": stats.nodes, "cutoffs": stats.cutoffs}
+
+
+def iterative_deepening_engine(board: List[List[int]], player: int, depth: int,
+                               budget: float) -> Tuple[list, int, Dict]:
+    engine = IterativeDeepeningSearch()
+    value, line = engine.search(board, player, budget)
+    return (line[0] if line else None), value, {"nodes": engine.stats.nodes, "cutoffs": engine.stats.cutoffs}
+
+
+# the endgame database, loaded on its engine's first move
+database = None
+
+
+def database_engine(board: List[List[int]], player: int, depth: int, budget: float) -> Tuple[list, int, Dict]:
+    global database
+    if database is None:
+        database = EndgameDatabase.load_or_build()
+    return database.best_move(board, player), database.rate(board, player), {"nodes": 0}
+
+
+ENGINES = {
+    "minimax": minimax_engine,
+    "alphabeta": alpha_beta_engine,
+    "alphabeta-tt": alpha_beta_table_engine,
+    "alphabeta-tt-exact": alpha_beta_exact_table_engine,
+    "bitboard": bitboard_engine,
+    "iterative-deepening": iterative_deepening_engine,
+    "database": database_engine,
+}
+
+
+# nearest rank percentile of values, fraction between 0 and 1
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+# minimum, percentiles and maximum of a list of measurements
+def summarize(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    return {
+        "min": min(values),
+        "p50": percentile(values, 0.5),
+        "p90": percentile(values, 0.9),
+        "p99": percentile(values, 0.99),
+        "max": max(values),
+        "mean": sum(values) / len(values),
+    }
+
+
+# Tallies for one engine over every move it made
+class EngineRecord:
+
+    def __init__(self):
+        self.latencies = []
+        self.counters = {}
+        self.wins = 0
+        self.losses = 0
+        self.draws = 0
+
+    # add one move's time and counters
+    def add_move(self, seconds: float, counters: Dict[str, int]) -> None:
+        self.latencies.append(seconds)
+        for key, value in counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def to_dict(self) -> Dict:
+        seconds = sum(self.latencies)
+        nodes = self.counters.get("nodes", 0)
+        probes = self.counters.get("tt_probes")
+        return {
+            "wins": self.wins,
+            "losses": self.losses,
+            "draws": self.draws,
+            "moves": len(self.latencies),
+            "nodes": nodes,
+            "cutoffs": self.counters.get("cutoffs"),
+            "nodes_per_second": nodes / seconds if seconds else None,
+            "tt_probes": probes,
+            "tt_hits": self.counters.get("tt_hits"),
+            "tt_hit_rate": self.counters["tt_hits"] / probes if probes else None,
+            "tt_cutoffs": self.counters.get("tt_cutoffs"),
+            "latency_seconds": summarize(self.latencies),
+        }
+
+
+# Play one game, first moving as player 1. return the game's record and every (board, player) an engine moved from
+def play_game(first: str, second: str, seed: int, records: Dict[str, EngineRecord], depth: int = 4,
+              budget: float = 0.05, opening_plies: int = 2,
+              max_plies: int = 40) -> Tuple[Dict, List[Tuple[List[List[int]], int]]]:
+    rng = random.Random(seed)
+    names = {PLAYER_1: first, PLAYER_2: second}
+    board = make_board()
+    player = PLAYER_1
+    winner = None
+    positions = []
+
+    plies = 0
+    while plies < max_plies:
+        winner = check_wins(board)
+        if winner is not None:
+            break
+
+        if plies < opening_plies:
+            board = rng.choice(make_neighbors(board, player))
+        else:
+            positions.append((board, player))
+            tic = time.perf_counter()
+            move, _, counters = ENGINES[names[player]](board, player, depth, budget)
+            records[names[player]].add_move(time.perf_counter() - tic, counters)
+            # a player with no move loses
+            if move is None:
+                winner = PLAYER_2 if player == PLAYER_1 else PLAYER_1
+                break
+            board = move
+        player = PLAYER_2 if player == PLAYER_1 else PLAYER_1
+        plies += 1
+    else:
+        winner = check_wins(board)
+
+    if winner is None:
+        records[first].draws += 1
+        records[second].draws += 1
+    else:
+        records[names[winner]].wins += 1
+        records[names[PLAYER_2 if winner == PLAYER_1 else PLAYER_1]].losses += 1
+
+    game = {"first": first, "second": second, "seed": seed, "plies": plies,
+            "winner": None if winner is None else names[winner]}
+    return game, positions
+
+
+# minimax's value for the move from board to move, scored as the child it is in a depth ply search from board
+def move_value(board: List[List[int]], player: int, move: List[List[int]], depth: int) -> int:
+    root = Node(board, maxing=player == PLAYER_1, depth=MAX_DEPTH - depth)
+    root.push()
+    return minimax(root.make_child_with_board(move, keep=False))
+
+
+# Check the SAME_VALUE_ENGINES among engines on positions. return the positions where any two give different
+# values, the positions where they pick different moves, and the moves that score other than the value their
+# engine gave. Engines may break ties between equal moves differently, a bad move is the real mismatch.
+# With alphabeta-tt among engines, also return the positions where its own table gives another value than the
+# search without it
+def check_agreement(engines: List[str], positions: List[Tuple[List[List[int]], int]], depth: int = 4,
+                    budget: float = 0.05) -> Dict:
+    table_checked = "alphabeta-tt" in engines
+    engines = [checked for name, checked in SAME_VALUE_ENGINES.items() if name in engines]
+    disagreements = []
+    different_moves = []
+    bad_moves = []
+    table_differences = []
+    for board, player in positions:
+        results = {name: ENGINES[name](board, player, depth, budget) for name in engines}
+        values = {name: result[1] for name, result in results.items()}
+        moves = {name: result[0] for name, result in results.items()}
+        if len(set(values.values())) > 1:
+            disagreements.append({"board": board, "player": player, "values": values})
+        if table_checked:
+            value = alpha_beta_engine(board, player, depth, budget)[1]
+            table_value = alpha_beta_table_engine(board, player, depth, budget)[1]
+            if table_value != value:
+                table_differences.append({"board": board, "player": player, "value": value,
+                                          "table_value": table_value})
+        if len({str(move) for move in moves.values()}) > 1:
+            different_moves.append({"board": board, "player": player, "moves": moves})
+        for name, move in moves.items():
+            if move is None:
+                continue
+            value = move_value(board, player, move, depth)
+            if value != values[name]:
+                bad_moves.append({"engine": name, "board": board, "player": player, "move": move,
+                                  "value": values[name], "move_value": value})
+    return {"engines": engines, "positions": len(positions), "disagreements": disagreements,
+            "different_moves": different_moves, "bad_moves": bad_moves, "table_differences": table_differences}
+
+
+# the commit the arena ran against, None when not inside a git checkout
+def current_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Play every ordered pair of engines once per seed, check the depth limited engines' values and moves on up to
+# agreement_positions of the positions met and write everything as json to out_path. Raises once written when the
+# engines disagree on a value or a move scores other than its engine's value
+def run_arena(engines: List[str] = None, seeds: List[int] = None, depth: int = 4, budget: float = 0.05,
+              opening_plies: int = 2, max_plies: int = 40, agreement_positions: int = 50,
+              out_path: str = "arena.json") -> Dict:
+    if engines is None:
+        engines = DEFAULT_ENGINES
+    if seeds is None:
+        seeds = [0, 1]
+
+    records = {name: EngineRecord() for name in engines}
+    games = []
+    positions = []
+    for seed in seeds:
+        for first in engines:
+            for second in engines:
+                if first == second:
+                    continue
+                game, game_positions = play_game(first, second, seed, records, depth, budget, opening_plies,
+                                                 max_plies)
+                games.append(game)
+                positions.extend(game_positions)
+                print(f"seed {seed} {first} vs {second} -> {game['winner'] or 'draw'} in {game['plies']} plies")
+
+    sample = random.Random(0).sample(positions, min(agreement_positions, len(positions)))
+    agreement = check_agreement(engines, sample, depth, budget)
+    print(f"{len(agreement['disagreements'])} of {agreement['positions']} positions disagree on the value and "
+          f"{len(agreement['different_moves'])} on the move between {', '.join(agreement['engines'])}, "
+          f"{len(agreement['bad_moves'])} moves score other than their engine's value, alphabeta-tt's table with "
+          f"deeper entries changes {len(agreement['table_differences'])} values")
+
+    results = {
+        "commit": current_commit(),
+        "python": sys.version.split()[0],
+        "settings": {"depth": depth, "budget": budget, "opening_plies": opening_plies, "max_plies": max_plies,
+                     "seeds": seeds},
+        "engines": {name: record.to_dict() for name, record in records.items()},
+        "games": games,
+        "agreement": agreement,
+    }
+    for name, record in results["engines"].items():
+        latency = record["latency_seconds"]
+        print(f"{name} -> {record['wins']}W {record['losses']}L {record['draws']}D, "
+              f"p50 {latency.get('p50', 0):0.4f}s, {record['nodes_per_second'] or 0:0.0f} nodes/s")
+
+    with open(out_path, 'w') as out_file:
+        json.dump(results, out_file, indent=2)
+    if agreement["disagreements"] or agreement["bad_moves"]:
+        raise Exception(f"{len(agreement['disagreements'])} positions disagree on the value and "
+                        f"{len(agreement['bad_moves'])} moves score other than their engine's value, see {out_path}")
+    return results
+
+
+if __name__ == '__main__':
+    run_arena()